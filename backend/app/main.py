@@ -1,9 +1,15 @@
-from fastapi import FastAPI
+from app.services.startup import startup_timer
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 from app.routes import radar
+from app.services import metrics
+from app.services.data_cache import cache, EXPIRED
+from app.services.frame_history import frame_history
 from app.utils.config import config
 import asyncio
+import importlib
 import os
 
 app = FastAPI(title="Weather Radar API", version="1.0.0")
@@ -16,20 +22,66 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.add_middleware(metrics.MetricsMiddleware)
+
 app.include_router(radar.router, prefix="/api/radar", tags=["radar"])
 
 @app.get("/health")
 async def health_check():
+    """Liveness: the process is up and serving requests."""
     return {"status": "ok"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: a radar frame is loaded and has not expired. Also reports the startup breakdown."""
+    snapshot = cache.snapshot
+    if snapshot.last_updated is None:
+        status = "starting"
+    elif snapshot.freshness() == EXPIRED:
+        status = "expired"
+    else:
+        status = "ready"
+    return JSONResponse(
+        status_code=200 if status == "ready" else 503,
+        content={
+            "status": status,
+            "dataTimestamp": snapshot.data_timestamp.isoformat() if snapshot.data_timestamp else None,
+            "freshness": snapshot.freshness(),
+            "frames": len(frame_history),
+            "startup": startup_timer.phases(),
+        },
+    )
+
+@app.get("/metrics")
+async def get_metrics():
+    """Pipeline, cache and request metrics in the Prometheus text format."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 frontend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "frontend", "dist")
 if os.path.exists(frontend_dir):
     app.mount("/", StaticFiles(directory=frontend_dir, html=True), name="frontend")
 
+async def _start_scheduler():
+    # The fetch and parse machinery is imported in a thread once the server
+    # is up, so it never delays binding the port or answering /health
+    scheduler = await asyncio.to_thread(importlib.import_module, "app.services.scheduler")
+    await scheduler.start_scheduler()
+
 @app.on_event("startup")
 async def startup_event():
-    from app.services.scheduler import start_scheduler
-    asyncio.create_task(start_scheduler())
+    asyncio.create_task(_start_scheduler())
+    startup_timer.mark("startup")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    from app.services.scheduler import stop_scheduler
+    from app.services.mrms_fetcher import close_client
+    from app.services.parse_worker import parse_worker
+    stop_scheduler()
+    await close_client()
+    parse_worker.stop()
+
+startup_timer.mark("imports")
 
 if __name__ == "__main__":
     import uvicorn
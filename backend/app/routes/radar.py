@@ -1,17 +1,365 @@
-from fastapi import APIRouter, HTTPException
-from app.services.data_cache import cache
+import asyncio
+import math
+import numpy as np
+from typing import Dict, List, Literal, Optional, Tuple
+from fastapi import APIRouter, HTTPException, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel
+from app.services.broadcaster import broadcaster
+from app.services.data_cache import cache, product_caches, region_caches, DataCache, EncodedPayload, EXPIRED
+from app.services.frame_delta import delta_cache
+from app.services.frame_history import frame_history, parse_frame_id
+from app.services.point_query import query_points
+from app.services.point_stream import FORMATS, stream_points
+from app.services.products import default_product, products
+from app.services.query_cache import query_cache
+from app.services.radar_image import ImageLayout
+from app.services.regions import Region, regions
+from app.services.tile_cache import tile_cache
+from app.services.vector_tiles import render_tile
+from app.utils.config import config
 
 router = APIRouter()
 
-@router.get("/latest")
-async def get_latest_radar():
-    cached = cache.get()
-    
-    if not cached:
+def _negotiate_encoding(accept_encoding: str, payload: EncodedPayload) -> Optional[str]:
+    accepted = {}
+    for token in accept_encoding.split(","):
+        name, _, params = token.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                quality = 0.0
+        accepted[name.strip().lower()] = quality
+
+    if payload.brotli is not None and accepted.get("br", 0) > 0:
+        return "br"
+    if payload.gzip is not None and accepted.get("gzip", 0) > 0:
+        return "gzip"
+    return None
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return "*" in tags or etag in tags
+
+def payload_response(
+    payload: EncodedPayload,
+    request: Request,
+    media_type: str = "application/json",
+    cache_headers: Optional[Dict[str, str]] = None,
+) -> Response:
+    headers = {
+        "ETag": payload.etag,
+        "Vary": "Accept-Encoding",
+        "Cache-Control": "no-cache",
+        **(cache_headers or {}),
+    }
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and _etag_matches(if_none_match, payload.etag):
+        return Response(status_code=304, headers=headers)
+
+    encoding = _negotiate_encoding(request.headers.get("accept-encoding", ""), payload)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=payload.encoded(encoding), media_type=media_type, headers=headers)
+
+# A versioned image.png URL names one rendering, whose bytes never change
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+def _image_version(payload: EncodedPayload) -> str:
+    return payload.etag.strip('"')
+
+def _parse_bbox(bbox: str) -> Tuple[float, float, float, float]:
+    try:
+        min_lon, min_lat, max_lon, max_lat = (float(value) for value in bbox.split(","))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="bbox must be minLon,minLat,maxLon,maxLat")
+    # float() accepts nan, inf and overflows to inf; none of them index a grid
+    if not all(math.isfinite(value) for value in (min_lon, min_lat, max_lon, max_lat)):
+        raise HTTPException(status_code=400, detail="bbox coordinates must be finite numbers")
+    if not (-180 <= min_lon <= 180 and -180 <= max_lon <= 180 and -90 <= min_lat <= 90 and -90 <= max_lat <= 90):
+        raise HTTPException(status_code=400, detail="bbox longitudes must be within -180..180 and latitudes within -90..90")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(status_code=400, detail="bbox minimums must not exceed maximums")
+    return min_lon, min_lat, max_lon, max_lat
+
+def _region(name: str) -> Region:
+    if name not in regions:
+        raise HTTPException(status_code=404, detail=f"Unknown region {name}; see /api/radar/regions")
+    return regions[name]
+
+async def latest_response(
+    data_cache: DataCache,
+    request: Request,
+    format: str,
+    bbox: Optional[Tuple[float, float, float, float]],
+    min_value: Optional[float],
+):
+    # One snapshot per request: payload, timestamps and headers all match
+    snapshot = data_cache.snapshot
+    if snapshot.last_updated is not None and snapshot.freshness() == EXPIRED:
+        return JSONResponse(
+            status_code=503,
+            content={
+                "error": "Radar data expired",
+                "message": f"No radar update in the last {config.CACHE_TTL // 60} minutes. Please try again later.",
+            },
+            headers={"Cache-Control": "no-store", "Retry-After": str(config.POLL_LATE_INTERVAL)},
+        )
+
+    # Contours are traced on first request per update rather than on every refresh
+    if bbox is not None or min_value is not None or format == "contours":
+        payload = await query_cache.get(data_cache, snapshot, format, bbox, min_value)
+    else:
+        payload = snapshot.payloads.get(format)
+
+    if payload is None:
         return {
             "error": "Radar data not available",
             "message": "Data is still being fetched. Please try again in a moment."
         }
-    
-    return cached
 
+    return payload_response(payload, request, cache_headers=snapshot.headers())
+
+@router.get("/latest")
+async def get_latest_radar(
+    request: Request,
+    format: Literal["geojson", "columnar", "contours"] = "geojson",
+    bbox: Optional[str] = None,
+    min_dbz: Optional[float] = None,
+    region: Optional[str] = None,
+):
+    data_cache = region_caches[_region(region).name] if region is not None else cache
+    return await latest_response(data_cache, request, format, _parse_bbox(bbox) if bbox is not None else None, min_dbz)
+
+@router.get("/delta")
+async def get_radar_delta(request: Request, since: str):
+    """
+    Cells of the columnar ``/latest`` grid that changed since frame ``since``
+    (a ``dataTimestamp`` or frame id), or the full columnar payload when that
+    frame is no longer retained or lies on another grid; ``format`` tells which.
+    """
+    parsed = parse_frame_id(since)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="since must be a frame id (YYYYMMDD-HHMMSS) or ISO 8601")
+    snapshot = cache.snapshot
+    payload = delta_cache.get(parsed, snapshot) if snapshot.freshness() != EXPIRED else None
+    if payload is None:
+        return await latest_response(cache, request, "columnar", None, None)
+    return payload_response(payload, request, cache_headers=snapshot.headers())
+
+@router.get("/products")
+async def list_radar_products():
+    return {
+        "products": [
+            {
+                **product.describe(),
+                "dataTimestamp": (
+                    product_caches[name].data_timestamp.isoformat() if product_caches[name].is_valid() else None
+                ),
+            }
+            for name, product in products.items()
+        ]
+    }
+
+@router.get("/regions")
+async def list_radar_regions():
+    return {"regions": [region.describe() for region in regions.values()]}
+
+class PointBatch(BaseModel):
+    lat: List[float]
+    lon: List[float]
+    history: bool = True
+
+def _point_arrays(lats: List[float], lons: List[float]) -> Tuple[np.ndarray, np.ndarray]:
+    if len(lats) != len(lons):
+        raise HTTPException(status_code=400, detail="lat and lon must have the same length")
+    if len(lats) > config.POINT_BATCH_MAX:
+        raise HTTPException(status_code=400, detail=f"At most {config.POINT_BATCH_MAX} locations per request")
+    lat_array = np.asarray(lats, dtype=np.float64)
+    lon_array = np.asarray(lons, dtype=np.float64)
+    if not (np.all(np.abs(lat_array) <= 90) and np.all(np.abs(lon_array) <= 360)):
+        raise HTTPException(status_code=400, detail="lat must be within -90..90 and lon within -360..360")
+    return lat_array, lon_array
+
+@router.get("/point")
+async def get_radar_point(lat: float, lon: float, history: bool = True):
+    """Reflectivity at one location now and, with ``history``, in every retained frame."""
+    result = query_points(*_point_arrays([lat], [lon]), history=history)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Radar data is still being fetched")
+
+    point = {
+        "lat": lat,
+        "lon": lon,
+        "dataTimestamp": result["dataTimestamp"],
+        "reflectivity": result["reflectivity"][0],
+    }
+    if history:
+        point["history"] = [
+            {"dataTimestamp": timestamp, "reflectivity": values[0]}
+            for timestamp, values in zip(result["history"]["timestamps"], result["history"]["reflectivity"])
+        ]
+    return point
+
+@router.post("/point")
+async def get_radar_points(batch: PointBatch):
+    """
+    Batch form of ``GET /point``. Answers are columnar: ``reflectivity[i]``
+    and ``history.reflectivity[k][i]`` belong to ``(lat[i], lon[i])``.
+    """
+    result = query_points(*_point_arrays(batch.lat, batch.lon), history=batch.history)
+    if result is None:
+        raise HTTPException(status_code=503, detail="Radar data is still being fetched")
+    return result
+
+@router.get("/image")
+async def get_radar_image_metadata():
+    """
+    Size and corner coordinates (top-left, top-right, bottom-right,
+    bottom-left) of ``image.png``, ready for a Mapbox ``image`` source.
+    """
+    snapshot = cache.snapshot
+    payload = snapshot.payloads.get("image")
+    if payload is None or snapshot.grid is None or snapshot.freshness() == EXPIRED:
+        raise HTTPException(status_code=503, detail="Radar data is still being fetched")
+    return {
+        "url": f"/api/radar/image.png?v={_image_version(payload)}",
+        **ImageLayout(snapshot.grid).metadata(),
+        "lastUpdated": snapshot.last_updated.isoformat(),
+        "dataTimestamp": snapshot.data_timestamp.isoformat(),
+    }
+
+@router.get("/image.png")
+async def get_radar_image(request: Request, v: Optional[str] = None):
+    """
+    The latest rendered PNG. Under the versioned URL from ``/image`` it may
+    be cached for good; the unversioned URL, or a version no longer current,
+    is revalidated on every use.
+    """
+    payload = cache.get_payload("image")
+    if payload is None:
+        raise HTTPException(status_code=503, detail="Radar data is still being fetched")
+    immutable = v is not None and v == _image_version(payload)
+    cache_headers = {"Cache-Control": IMMUTABLE_CACHE_CONTROL} if immutable else None
+    return payload_response(payload, request, media_type="image/png", cache_headers=cache_headers)
+
+@router.get("/stream")
+async def stream_radar_updates():
+    """
+    Server-Sent Events: a ``radar`` event with the current ``dataTimestamp``
+    and payload ETags on connect and after every update.
+    """
+    subscriber = broadcaster.subscribe()
+
+    async def events():
+        try:
+            yield b"retry: 5000\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), timeout=config.STREAM_HEARTBEAT)
+                except asyncio.TimeoutError:
+                    message = b": keep-alive\n\n"
+                if message is None:
+                    return
+                yield message
+        finally:
+            broadcaster.unsubscribe(subscriber)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@router.get("/frames")
+async def list_radar_frames():
+    return {
+        "frames": [
+            {
+                "id": frame.id,
+                "dataTimestamp": frame.timestamp.isoformat(),
+                "url": f"/api/radar/frames/{frame.id}",
+            }
+            for frame in frame_history.frames()
+        ]
+    }
+
+@router.get("/frames/{timestamp}")
+async def get_radar_frame(request: Request, timestamp: str):
+    parsed = parse_frame_id(timestamp)
+    if parsed is None:
+        raise HTTPException(status_code=400, detail="timestamp must be a frame id (YYYYMMDD-HHMMSS) or ISO 8601")
+
+    frame = frame_history.get(parsed)
+    if frame is None:
+        raise HTTPException(status_code=404, detail=f"No retained frame for {timestamp}")
+
+    return payload_response(frame.payload(), request)
+
+@router.get("/points")
+async def stream_radar_points(
+    format: Literal["ndjson", "geojsonseq"] = "ndjson",
+    decimation: int = config.DECIMATION_FACTOR,
+    bbox: Optional[str] = None,
+    min_dbz: Optional[float] = None,
+    region: Optional[str] = None,
+):
+    """Points of the latest grid at any decimation down to the native grid, streamed row band by row band."""
+    if not 1 <= decimation <= 100:
+        raise HTTPException(status_code=400, detail="decimation must be within 1..100")
+    if region is not None and bbox is not None:
+        raise HTTPException(status_code=400, detail="Pass either bbox or region, not both")
+
+    # Hold on to this update's grid, so a refresh mid-stream cannot mix scans
+    snapshot = cache.snapshot
+    grid, data_timestamp = snapshot.grid, snapshot.data_timestamp
+    if grid is None or snapshot.freshness() == EXPIRED:
+        raise HTTPException(status_code=503, detail="Radar data is still being fetched")
+    window = _region(region).bbox if region is not None else _parse_bbox(bbox) if bbox is not None else None
+    if window is not None:
+        grid = grid.crop(*grid.window(*window, stride=decimation))
+
+    return StreamingResponse(
+        stream_points(grid, default_product, decimation, min_dbz, format),
+        media_type=FORMATS[format][1],
+        headers={"Cache-Control": "no-cache", "X-Data-Timestamp": data_timestamp.isoformat()},
+    )
+
+@router.get("/tiles/{z}/{x}/{y}.mvt")
+async def get_radar_tile(request: Request, z: int, x: int, y: int):
+    if not 0 <= z <= config.MAX_TILE_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=400, detail=f"Invalid tile {z}/{x}/{y}")
+
+    snapshot = cache.snapshot
+    grid = snapshot.grid
+    if grid is None or snapshot.freshness() == EXPIRED:
+        raise HTTPException(status_code=503, detail="Radar data is still being fetched")
+
+    key = (snapshot.data_timestamp, z, x, y)
+    payload = tile_cache.get(key)
+    if payload is None:
+        payload = EncodedPayload(render_tile(grid, z, x, y))
+        tile_cache.put(key, payload)
+
+    return payload_response(payload, request, media_type="application/vnd.mapbox-vector-tile")
+
+@router.get("/{product}/latest")
+async def get_latest_product(
+    request: Request,
+    product: str,
+    format: Literal["geojson", "columnar"] = "geojson",
+    bbox: Optional[str] = None,
+    min_value: Optional[float] = None,
+    region: Optional[str] = None,
+):
+    """Like ``/latest`` for any enabled product (see ``/products``); ``min_value`` is in the product's units."""
+    if product not in product_caches:
+        raise HTTPException(status_code=404, detail=f"Unknown radar product {product}")
+    if region is not None and bbox is not None:
+        raise HTTPException(status_code=400, detail="Pass either bbox or region, not both")
+    # Only the default product keeps per-region payloads; cut the others on request
+    window = _region(region).bbox if region is not None else _parse_bbox(bbox) if bbox is not None else None
+    return await latest_response(product_caches[product], request, format, window, min_value)
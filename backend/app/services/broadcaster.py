@@ -0,0 +1,93 @@
+import asyncio
+import json
+from typing import Any, Dict, Optional, Set
+from app.services.data_cache import cache, product_caches, region_caches
+from app.utils.config import config
+
+class Subscriber:
+    """One stream client: a bounded queue of pre-formatted events."""
+
+    __slots__ = ("queue", "dropped")
+
+    def __init__(self, max_events: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_events)
+        self.dropped = False
+
+class Broadcaster:
+    """
+    Fans update notifications out to ``/api/radar/stream`` clients.
+
+    Each event is formatted once and shared by every subscriber. An idle
+    client costs one queue and one suspended coroutine. A client whose queue
+    fills up (it is not reading fast enough) is dropped instead of buffered:
+    its queue is replaced by a single ``None`` that ends the stream, and
+    ``EventSource`` reconnects and resynchronizes from the current state.
+    """
+
+    def __init__(self, max_events: int = config.STREAM_QUEUE_SIZE):
+        self.max_events = max_events
+        self._subscribers: Set[Subscriber] = set()
+        self._last_event: Optional[bytes] = None
+
+    def subscribe(self) -> Subscriber:
+        subscriber = Subscriber(self.max_events)
+        if self._last_event is not None:
+            subscriber.queue.put_nowait(self._last_event)
+        self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+
+    def publish(self, event: str, data: Dict[str, Any]):
+        """Queue an event for every subscriber; must run on the event loop thread."""
+        message = format_event(event, data)
+        self._last_event = message
+        for subscriber in list(self._subscribers):
+            try:
+                subscriber.queue.put_nowait(message)
+            except asyncio.QueueFull:
+                self._drop(subscriber)
+
+    def _drop(self, subscriber: Subscriber):
+        self._subscribers.discard(subscriber)
+        subscriber.dropped = True
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(None)
+
+    def __len__(self) -> int:
+        return len(self._subscribers)
+
+def format_event(event: str, data: Dict[str, Any]) -> bytes:
+    return f"event: {event}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n".encode("utf-8")
+
+def announce_update():
+    """Tell stream clients which data is current, so they fetch only when an ETag changed."""
+    if not cache.is_valid():
+        return
+    snapshot = cache.snapshot
+    product_snapshots = {
+        name: product_cache.snapshot
+        for name, product_cache in product_caches.items()
+        if product_cache is not cache and product_cache.is_valid()
+    }
+    broadcaster.publish("radar", {
+        "dataTimestamp": snapshot.data_timestamp.isoformat(),
+        "lastUpdated": snapshot.last_updated.isoformat(),
+        "etags": {format: payload.etag for format, payload in snapshot.payloads.items()},
+        "products": {
+            name: {
+                "dataTimestamp": product_snapshot.data_timestamp.isoformat(),
+                "etags": {format: payload.etag for format, payload in product_snapshot.payloads.items()},
+            }
+            for name, product_snapshot in product_snapshots.items()
+        },
+        "regions": {
+            name: {format: payload.etag for format, payload in region_cache.payloads.items()}
+            for name, region_cache in region_caches.items()
+            if region_cache.is_valid()
+        },
+    })
+
+broadcaster = Broadcaster()
@@ -0,0 +1,87 @@
+import random
+import statistics
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional
+from app.services import metrics
+from app.utils.config import config
+
+class PublishCadence:
+    """
+    Learns when MRMS publishes the next scan, to poll right after it appears.
+
+    ``period`` is the median spacing of recent product timestamps and
+    ``lag`` a low percentile of how long after its product time each scan
+    was first seen here (upload and listing delay). Polling early is cheap
+    (a conditional GET of the listing), so the estimate leans early and
+    ``next_delay`` re-polls every ``POLL_LATE_INTERVAL`` while a scan is late.
+    """
+
+    def __init__(self, history: int = 12):
+        self.history = history
+        self._products: List[datetime] = []
+        self._lags: List[float] = []
+        self.failures = 0
+
+    @property
+    def period(self) -> float:
+        spacings = [(b - a).total_seconds() for a, b in zip(self._products, self._products[1:])]
+        spacings = [spacing for spacing in spacings if spacing > 0]
+        if not spacings:
+            return config.PUBLISH_PERIOD
+        return min(max(statistics.median(spacings), config.POLL_MIN_INTERVAL), config.UPDATE_INTERVAL)
+
+    @property
+    def lag(self) -> float:
+        if not self._lags:
+            return 0.0
+        ordered = sorted(self._lags)
+        return min(ordered[len(ordered) // 4], self.period)
+
+    @property
+    def last_product(self) -> Optional[datetime]:
+        return self._products[-1] if self._products else None
+
+    def seed(self, timestamps: Iterable[datetime]):
+        """Learn the period from product times in a directory listing."""
+        for timestamp in timestamps:
+            self._add_product(timestamp)
+
+    def observe(self, product_time: datetime, seen_at: Optional[datetime] = None):
+        """Record a newly fetched scan and when it was first seen."""
+        seen_at = seen_at or datetime.now(timezone.utc)
+        if product_time.tzinfo is None:
+            product_time = product_time.replace(tzinfo=timezone.utc)
+        # The first scan after startup may have been published long ago, so it says nothing about lag
+        is_new = self.last_product is not None and product_time > self.last_product
+        self._add_product(product_time)
+        if is_new:
+            self._lags = (self._lags + [max(0.0, (seen_at - product_time).total_seconds())])[-self.history:]
+        self.failures = 0
+        metrics.PUBLISH_PERIOD.set(self.period)
+        metrics.PUBLISH_LAG.set(self.lag)
+
+    def _add_product(self, timestamp: datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        if timestamp not in self._products:
+            self._products = sorted(self._products + [timestamp])[-self.history:]
+
+    def next_delay(self, outcome: str, now: Optional[datetime] = None) -> float:
+        """Seconds to wait before the next poll, given how the last one went."""
+        if outcome == "error":
+            self.failures += 1
+            # Full jitter keeps restarted workers from retrying in lockstep
+            ceiling = min(config.POLL_BACKOFF_MAX, config.POLL_LATE_INTERVAL * 2 ** self.failures)
+            return random.uniform(config.POLL_MIN_INTERVAL, max(config.POLL_MIN_INTERVAL, ceiling))
+        self.failures = 0
+
+        if self.last_product is None:
+            return config.POLL_LATE_INTERVAL
+        now = now or datetime.now(timezone.utc)
+        expected = self.last_product.timestamp() + self.period + self.lag
+        delay = expected - now.timestamp()
+        if delay <= 0:
+            delay = config.POLL_LATE_INTERVAL
+        return min(max(delay, config.POLL_MIN_INTERVAL), config.UPDATE_INTERVAL)
+
+cadence = PublishCadence()
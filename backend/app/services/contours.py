@@ -0,0 +1,510 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from app.services.grib2_parser import RadarGrid
+from app.utils.config import config
+
+# Marching squares in index space (x = column, y = row). Cell (i, j) has
+# corners p0 = (i, j), p1 = (i, j+1), p2 = (i+1, j+1), p3 = (i+1, j) and
+# edges e0 = p0-p1, e1 = p1-p2, e2 = p2-p3, e3 = p3-p0. Every contour
+# segment is oriented with the region >= threshold on its left.
+_CORNERS = np.array([(0, 0), (1, 0), (1, 1), (0, 1)], dtype=float)
+_EDGE_MIDPOINTS = np.array([(0.5, 0), (1, 0.5), (0.5, 1), (0, 0.5)])
+_EDGE_CORNERS = ((0, 1), (1, 2), (2, 3), (3, 0))
+# Edge e of cell (i, j) as (row offset, column offset, is vertical edge)
+_EDGE_OFFSETS = np.array([(0, 0, 0), (0, 1, 1), (1, 0, 0), (0, 0, 1)], dtype=np.int64)
+
+# Crossings stay this far (in cells) from grid nodes, so a node sitting exactly
+# on a threshold cannot pinch two rings, or one ring, together
+_NODE_MARGIN = 0.05
+_ROW_BAND = 256
+# Bin size, in cells, for the segment intersection check after simplification
+_BIN_CELLS = 2
+# Output precision in degrees. Traced vertices are snapped to this lattice
+# and simplified in integer lattice units, so the intersection check is exact
+# for the coordinates that are actually served.
+_COORDINATE_DECIMALS = 4
+_LATTICE = 10 ** _COORDINATE_DECIMALS
+
+def _orient(a: int, b: int, inside: List[int]) -> Tuple[int, int]:
+    start, end = _EDGE_MIDPOINTS[a], _EDGE_MIDPOINTS[b]
+    dx, dy = end - start
+    side = dx * (_CORNERS[:, 1] - start[1]) - dy * (_CORNERS[:, 0] - start[0])
+    left = [k for k in range(4) if side[k] > 0]
+    right = [k for k in range(4) if side[k] < 0]
+    # The smaller group is the corner(s) the segment cuts off; its status
+    # decides which side is inside (the larger group may be mixed in saddles)
+    if len(right) < len(left):
+        inside_left = not inside[right[0]]
+    else:
+        inside_left = bool(inside[left[0]])
+    return (a, b) if inside_left else (b, a)
+
+def _build_segment_table() -> np.ndarray:
+    """``table[case, joined, slot] = (start edge, end edge)``, or -1 for no segment."""
+    table = np.full((16, 2, 2, 2), -1, dtype=np.int64)
+    for case in range(16):
+        inside = [(case >> k) & 1 for k in range(4)]
+        crossed = [edge for edge, (a, b) in enumerate(_EDGE_CORNERS) if inside[a] != inside[b]]
+        for joined in (0, 1):
+            if len(crossed) == 2:
+                pairs = [tuple(crossed)]
+            elif len(crossed) == 4:
+                # Saddle: cut off the inside corners, or the outside ones when
+                # the cell center is inside (the two inside corners connect)
+                pairs = [((k - 1) % 4, k) for k in range(4) if inside[k] != joined]
+            else:
+                pairs = []
+            for slot, (a, b) in enumerate(pairs):
+                table[case, joined, slot] = _orient(a, b, inside)
+    return table
+
+_SEGMENTS = _build_segment_table()
+
+class _Rings:
+    """
+    Closed contour rings of one threshold: vertices grouped by ring, the
+    vertices kept by simplification, and crossings of cell-row midlines.
+    """
+
+    def __init__(self, xs, ys, offsets, areas, crossing_ring, crossing_row, crossing_x, keep=None):
+        self.xs = xs
+        self.ys = ys
+        self.offsets = offsets
+        self.areas = areas
+        self.crossing_ring = crossing_ring
+        self.crossing_row = crossing_row
+        self.crossing_x = crossing_x
+        self.keep = np.ones(len(xs), dtype=bool) if keep is None else keep
+
+    def __len__(self) -> int:
+        return len(self.areas)
+
+    def reversed(self) -> "_Rings":
+        """Same rings walked the other way, i.e. with the region below the threshold on the left."""
+        lengths = np.diff(self.offsets)
+        starts = np.repeat(self.offsets[:-1], lengths)
+        stops = np.repeat(self.offsets[1:], lengths)
+        mirrored = starts + stops - 1 - np.arange(len(self.xs))
+        return _Rings(
+            self.xs[mirrored], self.ys[mirrored], self.offsets, -self.areas,
+            self.crossing_ring, self.crossing_row, self.crossing_x, self.keep[mirrored],
+        )
+
+def _pad(values: np.ndarray, floor: float) -> np.ndarray:
+    """
+    Surround the grid with a border at ``floor`` and raise missing or lower
+    cells to it, so every ring closes and edges next to missing data still
+    interpolate to distinct crossings for distinct thresholds.
+    """
+    padded = np.full((values.shape[0] + 2, values.shape[1] + 2), floor, dtype=np.float32)
+    inner = padded[1:-1, 1:-1]
+    np.clip(values, floor, config.MAX_REFLECTIVITY, out=inner)
+    inner[np.isnan(inner)] = floor
+    return padded
+
+def _edge_points(padded: np.ndarray, edge_ids: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Where the contour crosses each edge, by linear interpolation between its two corners."""
+    rows, cols = padded.shape
+    flat = padded.ravel()
+    vertical = edge_ids >= rows * cols
+    index = np.where(vertical, edge_ids - rows * cols, edge_ids)
+    a = flat[index]
+    b = flat[index + np.where(vertical, cols, 1)]
+    t = np.clip((threshold - a) / (b - a), _NODE_MARGIN, 1 - _NODE_MARGIN)
+    i, j = np.divmod(index, cols)
+    xs = j + np.where(vertical, 0.0, t)
+    ys = i + np.where(vertical, t, 0.0)
+    return xs, ys
+
+def _segments(padded: np.ndarray, threshold: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Oriented segments as (cell row, start edge id, end edge id), one row band at a time."""
+    rows, cols = padded.shape
+    seg_rows, starts, ends = [], [], []
+    for r0 in range(0, rows - 1, _ROW_BAND):
+        r1 = min(r0 + _ROW_BAND, rows - 1)
+        mask = padded[r0:r1 + 1] >= threshold
+        case = (
+            mask[:-1, :-1].astype(np.uint8)
+            | mask[:-1, 1:].astype(np.uint8) << 1
+            | mask[1:, 1:].astype(np.uint8) << 2
+            | mask[1:, :-1].astype(np.uint8) << 3
+        )
+        i, j = np.nonzero((case != 0) & (case != 15))
+        if not len(i):
+            continue
+        case = case[i, j]
+        i = i + r0
+        joined = np.zeros(len(i), dtype=np.int64)
+        saddle = (case == 5) | (case == 10)
+        if saddle.any():
+            si, sj = i[saddle], j[saddle]
+            center = (padded[si, sj] + padded[si, sj + 1] + padded[si + 1, sj + 1] + padded[si + 1, sj]) / 4
+            joined[saddle] = center >= threshold
+
+        for slot in (0, 1):
+            pairs = _SEGMENTS[case, joined, slot]
+            present = pairs[:, 0] >= 0
+            pi, pj, pairs = i[present], j[present], pairs[present]
+            ids = []
+            for end in (0, 1):
+                offset = _EDGE_OFFSETS[pairs[:, end]]
+                ids.append(offset[:, 2] * rows * cols + (pi + offset[:, 0]) * cols + pj + offset[:, 1])
+            seg_rows.append(pi)
+            starts.append(ids[0])
+            ends.append(ids[1])
+
+    if not starts:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(seg_rows), np.concatenate(starts), np.concatenate(ends)
+
+def _jump_iterations(n: int) -> int:
+    return max(1, int(np.ceil(np.log2(max(n, 2)))))
+
+def _trace_rings(padded: np.ndarray, threshold: float) -> _Rings:
+    """
+    Chain segments into closed rings without a Python-level walk.
+
+    Each crossing point starts exactly one segment and ends exactly one, so
+    ``next`` is a permutation whose cycles are the rings. Pointer jumping
+    labels every segment with the smallest index in its cycle and ranks it
+    by distance along the cycle, which gives each ring's vertex order.
+    """
+    seg_rows, starts, ends = _segments(padded, threshold)
+    n = len(starts)
+    if n == 0:
+        empty_f, empty_i = np.zeros(0), np.zeros(0, dtype=np.int64)
+        return _Rings(empty_f, empty_f, np.zeros(1, dtype=np.int64), empty_f, empty_i, empty_i, empty_f)
+
+    order = np.argsort(starts)
+    nxt = order[np.searchsorted(starts[order], ends)]
+
+    label = np.arange(n)
+    jump = nxt
+    for _ in range(_jump_iterations(n)):
+        label = np.minimum(label, label[jump])
+        jump = jump[jump]
+
+    tail = nxt == label
+    succ = np.where(tail, np.arange(n), nxt)
+    dist = (~tail).astype(np.int64)
+    for _ in range(_jump_iterations(n)):
+        dist = dist + dist[succ]
+        succ = succ[succ]
+
+    order = np.lexsort((-dist, label))
+    _, ring_starts, ring_of_segment = np.unique(label[order], return_index=True, return_inverse=True)
+    offsets = np.append(ring_starts, n)
+    ring_ids = np.empty(n, dtype=np.int64)
+    ring_ids[order] = ring_of_segment
+
+    xs, ys = _edge_points(padded, starts[order], threshold)
+    following = np.arange(1, n + 1)
+    following[offsets[1:] - 1] = offsets[:-1]
+    areas = np.add.reduceat(xs * ys[following] - xs[following] * ys, offsets[:-1]) / 2
+
+    # Crossings of each cell row's midline y = row + 0.5 (half-open, so a
+    # ring crosses every midline an even number of times)
+    sx, sy = _edge_points(padded, starts, threshold)
+    ex, ey = _edge_points(padded, ends, threshold)
+    midline = seg_rows + 0.5
+    crossing = (sy >= midline) != (ey >= midline)
+    sx, sy, ex, ey, midline = sx[crossing], sy[crossing], ex[crossing], ey[crossing], midline[crossing]
+    crossing_x = sx + (midline - sy) * (ex - sx) / (ey - sy)
+    return _Rings(xs, ys, offsets, areas, ring_ids[crossing], seg_rows[crossing], crossing_x)
+
+def _combine(parts: Sequence[_Rings]) -> _Rings:
+    ring_base = np.cumsum([0] + [len(part) for part in parts])
+    vertex_base = np.cumsum([0] + [len(part.xs) for part in parts])
+    return _Rings(
+        np.concatenate([part.xs for part in parts]),
+        np.concatenate([part.ys for part in parts]),
+        np.concatenate([[0]] + [part.offsets[1:] + base for part, base in zip(parts, vertex_base)]),
+        np.concatenate([part.areas for part in parts]),
+        np.concatenate([part.crossing_ring + base for part, base in zip(parts, ring_base)]),
+        np.concatenate([part.crossing_row for part in parts]),
+        np.concatenate([part.crossing_x for part in parts]),
+        np.concatenate([part.keep for part in parts]),
+    )
+
+def _assign_holes(rings: _Rings) -> np.ndarray:
+    """
+    Index of the outer ring enclosing each ring (itself for outer rings, -1 if unknown).
+
+    Scanning right along a midline from the first crossing of a hole, the
+    band region is on the left, so the nearest crossing further left enters
+    the band: either an outer ring's (the parent) or another hole's, whose
+    parent is shared. Chains are resolved by pointer jumping; they always
+    lead up and to the left, so they cannot loop.
+    """
+    count = len(rings)
+    outer = rings.areas > 0
+    parent = np.where(outer, np.arange(count), -1)
+
+    order = np.lexsort((rings.crossing_x, rings.crossing_row))
+    ring_sorted = rings.crossing_ring[order]
+    row_sorted = rings.crossing_row[order]
+    first_ring, first = np.unique(ring_sorted, return_index=True)
+    holes = ~outer[first_ring]
+    first_ring, first = first_ring[holes], first[holes]
+    has_left = (first > 0) & (row_sorted[first - 1] == row_sorted[first])
+    parent[first_ring[has_left]] = ring_sorted[first[has_left] - 1]
+
+    for _ in range(_jump_iterations(count)):
+        parent = np.where(parent >= 0, parent[np.maximum(parent, 0)], -1)
+    parent[(parent >= 0) & ~outer[np.maximum(parent, 0)]] = -1
+    return parent
+
+def _simplify(xs: np.ndarray, ys: np.ndarray, offsets: np.ndarray, tolerance: float) -> np.ndarray:
+    """
+    Douglas-Peucker over every ring at once; returns a keep mask per vertex.
+
+    Each ring is closed through its first vertex and split at the vertex
+    farthest from it, then all pending spans of all rings are refined
+    together, one NumPy pass per level of recursion.
+    """
+    n = len(xs)
+    if n == 0:
+        return np.zeros(0, dtype=bool)
+    keep = np.zeros(n, dtype=bool)
+    keep[offsets[:-1]] = True
+    ring_lengths = np.diff(offsets)
+    ring_of_vertex = np.repeat(np.arange(len(ring_lengths)), ring_lengths)
+    first = offsets[:-1][ring_of_vertex]
+    far = np.hypot(xs - xs[first], ys - ys[first])
+    far_max = np.maximum.reduceat(far, offsets[:-1])
+    split = offsets[:-1] + _first_argmax(far, far_max[ring_of_vertex], ring_of_vertex, len(ring_lengths))
+    keep[split] = True
+
+    # Spans are [a, b] with b possibly one past the ring, meaning "back to its first vertex"
+    span_a = np.concatenate([offsets[:-1], split])
+    span_b = np.concatenate([split, offsets[1:]])
+    span_ring = np.concatenate([np.arange(len(ring_lengths))] * 2)
+    while len(span_a):
+        interior = span_b - span_a - 1
+        useful = interior > 0
+        span_a, span_b, span_ring, interior = span_a[useful], span_b[useful], span_ring[useful], interior[useful]
+        if not len(span_a):
+            break
+        span_of = np.repeat(np.arange(len(span_a)), interior)
+        index = np.arange(interior.sum()) - np.repeat(np.cumsum(interior) - interior, interior) + np.repeat(span_a + 1, interior)
+
+        end = np.where(span_b == offsets[span_ring + 1], offsets[span_ring], span_b)
+        ax, ay = xs[span_a][span_of], ys[span_a][span_of]
+        bx, by = xs[end][span_of], ys[end][span_of]
+        dx, dy = bx - ax, by - ay
+        length = np.hypot(dx, dy)
+        distance = np.where(
+            length > 0,
+            np.abs(dx * (ys[index] - ay) - dy * (xs[index] - ax)) / np.where(length > 0, length, 1),
+            np.hypot(xs[index] - ax, ys[index] - ay),
+        )
+        span_starts = np.cumsum(interior) - interior
+        span_max = np.maximum.reduceat(distance, span_starts)
+        pick = index[span_starts + _first_argmax(distance, span_max[span_of], span_of, len(span_a))]
+
+        refine = span_max > tolerance
+        keep[pick[refine]] = True
+        span_a, span_b, span_ring = (
+            np.concatenate([span_a[refine], pick[refine]]),
+            np.concatenate([pick[refine], span_b[refine]]),
+            np.concatenate([span_ring[refine], span_ring[refine]]),
+        )
+    return keep
+
+def _first_argmax(values: np.ndarray, group_max: np.ndarray, group: np.ndarray, groups: int) -> np.ndarray:
+    """Offset of the first maximum within each group of a grouped, contiguous array."""
+    starts = np.zeros(groups, dtype=np.int64)
+    starts[1:] = np.cumsum(np.bincount(group, minlength=groups))[:-1]
+    hits = np.flatnonzero(values == group_max)
+    _, first = np.unique(group[hits], return_index=True)
+    return hits[first] - starts
+
+def _crossing_edges(
+    xs: np.ndarray,
+    ys: np.ndarray,
+    keep: np.ndarray,
+    ring_of_vertex: np.ndarray,
+    bin_size: float,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Edges ``(start, end)`` between kept vertices that touch or cross another edge.
+
+    Edges are binned on a coarse grid by bounding box and every pair sharing
+    a bin is tested with orientation signs. ``end`` is the next kept vertex
+    of the ring, which wraps around to its first one.
+    """
+    index = np.flatnonzero(keep)
+    if len(index) < 2:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    ring = ring_of_vertex[index]
+    change = ring[1:] != ring[:-1]
+    following = np.roll(index, -1)
+    following[np.append(change, True)] = index[np.flatnonzero(np.insert(change, 0, True))]
+    a, b = index, following
+    x1, y1, x2, y2 = xs[a], ys[a], xs[b], ys[b]
+
+    lo_x = (np.minimum(x1, x2) // bin_size).astype(np.int64)
+    lo_y = (np.minimum(y1, y2) // bin_size).astype(np.int64)
+    span_x = (np.maximum(x1, x2) // bin_size).astype(np.int64) - lo_x + 1
+    span_y = (np.maximum(y1, y2) // bin_size).astype(np.int64) - lo_y + 1
+    lo_x -= lo_x.min()
+    lo_y -= lo_y.min()
+    cells = span_x * span_y
+    edge = np.repeat(np.arange(len(a)), cells)
+    k = np.arange(cells.sum()) - np.repeat(np.cumsum(cells) - cells, cells)
+    key = (lo_x[edge] + k // span_y[edge]) * (int((lo_y + span_y).max()) + 1) + lo_y[edge] + k % span_y[edge]
+    order = np.argsort(key, kind="stable")
+    edge, key = edge[order], key[order]
+
+    group_starts = np.flatnonzero(np.insert(key[1:] != key[:-1], 0, True))
+    sizes = np.diff(np.append(group_starts, len(key)))
+    group = np.repeat(np.arange(len(group_starts)), sizes)
+    later = sizes[group] - (np.arange(len(key)) - group_starts[group]) - 1
+    p = np.repeat(np.arange(len(key)), later)
+    q = p + 1 + np.arange(later.sum()) - np.repeat(np.cumsum(later) - later, later)
+    i, j = edge[p], edge[q]
+    separate = (a[i] != a[j]) & (a[i] != b[j]) & (b[i] != a[j]) & (b[i] != b[j])
+    i, j = i[separate], j[separate]
+
+    def orientation(px, py, qx, qy, rx, ry):
+        return (qx - px) * (ry - py) - (qy - py) * (rx - px)
+
+    d1 = orientation(x1[i], y1[i], x2[i], y2[i], x1[j], y1[j])
+    d2 = orientation(x1[i], y1[i], x2[i], y2[i], x2[j], y2[j])
+    d3 = orientation(x1[j], y1[j], x2[j], y2[j], x1[i], y1[i])
+    d4 = orientation(x1[j], y1[j], x2[j], y2[j], x2[i], y2[i])
+    overlap = (
+        (np.maximum(x1[i], x2[i]) >= np.minimum(x1[j], x2[j]))
+        & (np.maximum(x1[j], x2[j]) >= np.minimum(x1[i], x2[i]))
+        & (np.maximum(y1[i], y2[i]) >= np.minimum(y1[j], y2[j]))
+        & (np.maximum(y1[j], y2[j]) >= np.minimum(y1[i], y2[i]))
+    )
+    hit = (d1 * d2 <= 0) & (d3 * d4 <= 0) & overlap
+    hits = np.unique(np.concatenate([i[hit], j[hit]]))
+    return a[hits], b[hits]
+
+def _snap(rings: _Rings, grid: RadarGrid):
+    """Move vertices from padded index space to integer lon/lat lattice units."""
+    rings.xs = np.rint((grid.lon0 + (rings.xs - 1) * grid.dlon) * _LATTICE)
+    rings.ys = np.rint((grid.lat0 + (rings.ys - 1) * grid.dlat) * _LATTICE)
+
+def _simplify_levels(traced: Sequence[_Rings], tolerance: float, min_area: float, cell_size: float):
+    """
+    Simplify the rings of every level together, preserving topology.
+
+    Contours of different levels never cross, and neither do rings of one
+    level, so the check runs over all of them at once: wherever a simplified
+    edge touches another, the original vertices it skipped are put back, and
+    the check repeats until the set is clean. Rings below ``min_area`` are
+    left whole; they are dropped from the output anyway. ``tolerance`` is
+    in cells of ``cell_size`` lattice units.
+    """
+    rings = _combine(traced)
+    lengths = np.diff(rings.offsets)
+    ring_of_vertex = np.repeat(np.arange(len(rings)), lengths)
+    large = np.abs(rings.areas) >= min_area
+
+    keep = _simplify(rings.xs, rings.ys, rings.offsets, tolerance * cell_size) | ~large[ring_of_vertex]
+    few = large & (np.bincount(ring_of_vertex[keep], minlength=len(rings)) < 3)
+    keep |= few[ring_of_vertex]
+    while True:
+        start, end = _crossing_edges(
+            rings.xs, rings.ys, keep & large[ring_of_vertex], ring_of_vertex, _BIN_CELLS * cell_size
+        )
+        # Put back the original vertices each offending edge had skipped
+        stop = np.where(end > start, end, rings.offsets[ring_of_vertex[start] + 1])
+        delta = np.zeros(len(keep) + 1, dtype=np.int64)
+        np.add.at(delta, start + 1, 1)
+        np.add.at(delta, stop, -1)
+        restore = (np.cumsum(delta)[:-1] > 0) & ~keep
+        if not restore.any():
+            break
+        keep |= restore
+
+    vertex_base = np.cumsum([0] + [len(part.xs) for part in traced])
+    for part, start in zip(traced, vertex_base):
+        part.keep = keep[start:start + len(part.xs)]
+
+def _band_polygons(rings: _Rings, grid: RadarGrid, min_area: float) -> List[List[List[List[float]]]]:
+    parent = _assign_holes(rings)
+    large = np.abs(rings.areas) >= min_area
+    kept = large & (parent >= 0) & large[np.maximum(parent, 0)]
+    if not kept.any():
+        return []
+
+    lengths = np.diff(rings.offsets)
+    keep = rings.keep & np.repeat(kept, lengths)
+    counts = np.bincount(np.repeat(np.arange(len(rings)), lengths)[keep], minlength=len(rings))[kept]
+    bounds = np.concatenate([[0], np.cumsum(counts)])
+
+    lons = np.round(rings.xs[keep] / _LATTICE, _COORDINATE_DECIMALS)
+    lats = np.round(rings.ys[keep] / _LATTICE, _COORDINATE_DECIMALS)
+    lons = np.where(lons > 180, lons - 360, lons)
+    # Ring areas were measured in index space; keep GeoJSON exteriors
+    # counter-clockwise on the map
+    flip = (grid.dlon > 0) != (grid.dlat > 0)
+
+    polygons: Dict[int, List[List[List[float]]]] = {}
+    ring_ids = np.flatnonzero(kept)
+    # Outer rings first so every hole finds its polygon
+    for position in np.argsort(parent[ring_ids] != ring_ids, kind="stable"):
+        ring = ring_ids[position]
+        owner = parent[ring]
+        if owner != ring and owner not in polygons:
+            continue
+        coordinates = np.column_stack((lons[bounds[position]:bounds[position + 1]], lats[bounds[position]:bounds[position + 1]]))
+        if flip:
+            coordinates = coordinates[::-1]
+        coordinates = np.vstack((coordinates, coordinates[:1])).tolist()
+        if owner == ring:
+            polygons[ring] = [coordinates]
+        else:
+            polygons[owner].append(coordinates)
+    return list(polygons.values())
+
+def grid_to_contours(
+    grid: RadarGrid,
+    levels: Sequence[float] = config.CONTOUR_LEVELS,
+    min_value: Optional[float] = None,
+    decimation: int = config.CONTOUR_DECIMATION,
+) -> Dict[str, Any]:
+    """
+    Isoband polygons of reflectivity, traced on every ``decimation``-th cell.
+
+    Returns a GeoJSON ``FeatureCollection`` with one ``MultiPolygon`` per
+    band ``minDbz <= value < maxDbz`` (the last band is open-ended), so a
+    fill layer colored by ``minDbz`` renders the whole field. Rings are
+    simplified with Douglas-Peucker at ``CONTOUR_TOLERANCE`` cells and rings
+    smaller than ``CONTOUR_MIN_AREA`` cells are dropped.
+    """
+    levels = sorted(levels)
+    if min_value is not None:
+        levels = [level for level in levels if level >= min_value]
+    if not levels:
+        return {"type": "FeatureCollection", "features": []}
+    grid = grid.decimated(decimation)
+    padded = _pad(grid.values, levels[0] - 1)
+    traced = [_trace_rings(padded, level) for level in levels]
+    del padded
+    for rings in traced:
+        _snap(rings, grid)
+    cell_size = min(abs(grid.dlon), abs(grid.dlat)) * _LATTICE
+    _simplify_levels(traced, config.CONTOUR_TOLERANCE, config.CONTOUR_MIN_AREA, cell_size)
+
+    features = []
+    for index, level in enumerate(levels):
+        upper = levels[index + 1] if index + 1 < len(levels) else None
+        parts = [traced[index]] + ([traced[index + 1].reversed()] if upper is not None else [])
+        polygons = _band_polygons(_combine(parts), grid, config.CONTOUR_MIN_AREA)
+        if not polygons:
+            continue
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "MultiPolygon", "coordinates": polygons},
+            "properties": {"minDbz": level, "maxDbz": upper},
+        })
+
+    print(f"Traced {sum(len(feature['geometry']['coordinates']) for feature in features)} contour polygons")
+    return {"type": "FeatureCollection", "features": features}
@@ -1,33 +1,281 @@
-from datetime import datetime
-from typing import Optional, Dict, Any
+import gzip
+import hashlib
+import json
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Optional, Dict, Any, Tuple
+from app.services import metrics
+from app.services.contours import grid_to_contours
+from app.services.grib2_parser import RadarGrid
+from app.services.products import RadarProduct, default_product, products
+from app.services.regions import regions
+from app.utils.config import config
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+class EncodedPayload:
+    """A response body serialized and compressed once, then shared by every request."""
+
+    __slots__ = ("body", "gzip", "brotli", "etag")
+
+    def __init__(self, body: bytes, compress: bool = True):
+        # Already-compressed bodies such as PNG are served as-is
+        self.body = body
+        self.gzip = gzip.compress(body, compresslevel=6) if compress else None
+        self.brotli = brotli.compress(body, quality=9) if brotli and compress else None
+        self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+    @classmethod
+    def from_encoded(cls, body, gzip, brotli, etag: str) -> "EncodedPayload":
+        """Wrap bodies that were already compressed elsewhere, e.g. by another worker."""
+        payload = cls.__new__(cls)
+        payload.body = body
+        payload.gzip = gzip
+        payload.brotli = brotli
+        payload.etag = etag
+        return payload
+
+    def encoded(self, encoding: Optional[str]) -> bytes:
+        if encoding == "br":
+            return self.brotli
+        if encoding == "gzip":
+            return self.gzip
+        return self.body
+
+# Freshness states of a cache snapshot, by time since it was refreshed
+FRESH = "fresh"
+STALE = "stale"
+EXPIRED = "expired"
+
+# Browsers always revalidate (a 304 while the ETag holds), so a new scan
+# announced on the event stream is fetched at once; shared caches such as a
+# CDN keep a copy while it is fresh and serve it stale while revalidating
+CACHE_CONTROL = (
+    f"public, max-age=0, s-maxage={config.CACHE_FRESH}, "
+    f"stale-while-revalidate={config.CACHE_TTL - config.CACHE_FRESH}, "
+    f"stale-if-error={config.CACHE_TTL - config.CACHE_FRESH}"
+)
+
+class CacheSnapshot:
+    """
+    Everything served for one update, replaced as a whole by a single
+    reference swap so readers never see one update's payloads with
+    another's timestamps. Read-only once built.
+    """
+
+    __slots__ = (
+        "data",
+        "columnar",
+        "grid",
+        "payloads",
+        "last_updated",
+        "data_timestamp",
+        "last_modified",
+    )
+
+    def __init__(
+        self,
+        payloads: Dict[str, EncodedPayload],
+        last_updated: Optional[datetime],
+        data_timestamp: Optional[datetime],
+        grid: Optional[RadarGrid] = None,
+        data: Optional[Dict[str, Any]] = None,
+        columnar: Optional[Dict[str, Any]] = None,
+    ):
+        set_slot = super().__setattr__
+        set_slot("data", data)
+        set_slot("columnar", columnar)
+        set_slot("grid", grid)
+        set_slot("payloads", payloads)
+        set_slot("last_updated", last_updated)
+        set_slot("data_timestamp", data_timestamp)
+        set_slot("last_modified", format_datetime(last_updated.astimezone(timezone.utc), usegmt=True) if last_updated else None)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("CacheSnapshot is immutable; build a new one")
+
+    def age(self, now: Optional[datetime] = None) -> float:
+        """Seconds since this snapshot was refreshed."""
+        return max(0.0, ((now or datetime.now()) - self.last_updated).total_seconds())
+
+    def freshness(self, now: Optional[datetime] = None) -> str:
+        """``FRESH`` up to ``CACHE_FRESH``, ``STALE`` until ``CACHE_TTL``, then ``EXPIRED``."""
+        if not self.payloads or self.last_updated is None:
+            return EXPIRED
+        age = self.age(now)
+        if age < config.CACHE_FRESH:
+            return FRESH
+        return STALE if age < config.CACHE_TTL else EXPIRED
+
+    def headers(self, now: Optional[datetime] = None) -> Dict[str, str]:
+        """Caching headers for a response built from this snapshot."""
+        return {
+            "Cache-Control": CACHE_CONTROL,
+            "Age": str(int(self.age(now))),
+            "Last-Modified": self.last_modified,
+            "X-Radar-Freshness": self.freshness(now),
+        }
+
+EMPTY = CacheSnapshot({}, None, None)
 
 class DataCache:
-    def __init__(self):
-        self.data: Optional[Dict[str, Any]] = None
-        self.last_updated: Optional[datetime] = None
-        self.data_timestamp: Optional[datetime] = None
-    
-    def set(self, data: Dict[str, Any], data_timestamp: Optional[datetime] = None):
-        self.data = data
-        self.last_updated = datetime.now()
-        self.data_timestamp = data_timestamp or datetime.now()
-    
-    def get(self) -> Optional[Dict[str, Any]]:
-        if not self.is_valid():
+    def __init__(self, product: Optional[RadarProduct] = None, record_stages: bool = True):
+        self.product = product or default_product
+        # Region caches are written inside the default refresh's "regions"
+        # stage; their own serialize/cache_swap runs are not recorded
+        self._stage_product = self.product.name if record_stages else None
+        self._snapshot = EMPTY
+
+    @property
+    def snapshot(self) -> CacheSnapshot:
+        """The current snapshot; read it once per request for a consistent view."""
+        return self._snapshot
+
+    @property
+    def data(self) -> Optional[Dict[str, Any]]:
+        return self._snapshot.data
+
+    @property
+    def columnar(self) -> Optional[Dict[str, Any]]:
+        return self._snapshot.columnar
+
+    @property
+    def grid(self) -> Optional[RadarGrid]:
+        return self._snapshot.grid
+
+    @property
+    def payloads(self) -> Dict[str, EncodedPayload]:
+        return self._snapshot.payloads
+
+    @property
+    def last_updated(self) -> Optional[datetime]:
+        return self._snapshot.last_updated
+
+    @property
+    def data_timestamp(self) -> Optional[datetime]:
+        return self._snapshot.data_timestamp
+
+    def set(
+        self,
+        data: Dict[str, Any],
+        data_timestamp: Optional[datetime] = None,
+        columnar: Optional[Dict[str, Any]] = None,
+        grid: Optional[RadarGrid] = None,
+        image: Optional[bytes] = None,
+        last_updated: Optional[datetime] = None,
+    ):
+        """
+        Serialize and publish a new snapshot. ``last_updated`` defaults to
+        now; a restored snapshot passes its original time so its age and
+        freshness carry over.
+        """
+        last_updated = last_updated or datetime.now()
+        data_timestamp = data_timestamp or last_updated
+        representations = {"geojson": data, "columnar": columnar}
+        with metrics.timed("serialize", self._stage_product):
+            payloads = {
+                format: EncodedPayload(self._serialize(representation, format, last_updated, data_timestamp))
+                for format, representation in representations.items()
+                if representation is not None
+            }
+            if image is not None:
+                payloads["image"] = EncodedPayload(image, compress=False)
+            snapshot = CacheSnapshot(payloads, last_updated, data_timestamp, grid, data, columnar)
+
+        with metrics.timed("cache_swap", self._stage_product):
+            self._snapshot = snapshot
+
+    def set_encoded(
+        self,
+        payloads: Dict[str, EncodedPayload],
+        grid: Optional[RadarGrid],
+        last_updated: datetime,
+        data_timestamp: datetime,
+    ):
+        """Publish payloads serialized by another process; ``get`` has no dicts to return in this case."""
+        self._snapshot = CacheSnapshot(payloads, last_updated, data_timestamp, grid)
+
+    def get(self, format: str = "geojson") -> Optional[Dict[str, Any]]:
+        snapshot = self._snapshot
+        if snapshot.freshness() == EXPIRED:
+            return None
+        data = {"geojson": snapshot.data, "columnar": snapshot.columnar}.get(format)
+        if data is None:
             return None
         return {
-            "data": self.data,
-            "lastUpdated": self.last_updated.isoformat(),
-            "dataTimestamp": self.data_timestamp.isoformat() if self.data_timestamp else None,
+            "data": data,
+            "format": format,
+            "lastUpdated": snapshot.last_updated.isoformat(),
+            "dataTimestamp": snapshot.data_timestamp.isoformat() if snapshot.data_timestamp else None,
         }
-    
+
+    def get_payload(self, format: str = "geojson") -> Optional[EncodedPayload]:
+        """Pre-serialized equivalent of ``get``; a dictionary lookup per request."""
+        snapshot = self._snapshot
+        if snapshot.freshness() == EXPIRED:
+            return None
+        return snapshot.payloads.get(format)
+
+    def query(
+        self,
+        format: str = "geojson",
+        bbox: Optional[Tuple[float, float, float, float]] = None,
+        min_value: Optional[float] = None,
+        snapshot: Optional[CacheSnapshot] = None,
+    ) -> Optional[EncodedPayload]:
+        """
+        Encode only the points inside ``bbox`` (minLon, minLat, maxLon, maxLat)
+        at or above ``min_value``, from ``snapshot`` or the current one.
+
+        The grid is regular, so the bbox maps to row/column slices by
+        arithmetic on its origin and step; the query never scans points
+        outside the window. This is CPU work; requests go through
+        ``query_cache``, which runs it off the event loop and keeps the result.
+        """
+        snapshot = snapshot or self._snapshot
+        grid = snapshot.grid
+        if snapshot.freshness() == EXPIRED or grid is None:
+            return None
+
+        # Contours are traced on a finer lattice than the points
+        decimation = config.CONTOUR_DECIMATION if format == "contours" else self.product.decimation
+        if bbox is not None:
+            grid = grid.crop(*grid.window(*bbox, stride=decimation))
+
+        if format == "contours":
+            data = grid_to_contours(grid, min_value=self.product.clamp_min(min_value))
+        elif format == "columnar":
+            data = self.product.columnar(grid, decimation, min_value)
+        else:
+            data = self.product.geojson(grid, decimation, min_value)
+        return EncodedPayload(self._serialize(data, format, snapshot.last_updated, snapshot.data_timestamp))
+
     def is_valid(self) -> bool:
-        return self.data is not None and self.last_updated is not None
-    
+        """True while there is data that has not expired."""
+        return self._snapshot.freshness() != EXPIRED
+
     def clear(self):
-        self.data = None
-        self.last_updated = None
-        self.data_timestamp = None
+        self._snapshot = EMPTY
 
-cache = DataCache()
+    @staticmethod
+    def _serialize(data: Dict[str, Any], format: str, last_updated: datetime, data_timestamp: datetime) -> bytes:
+        return json.dumps(
+            {
+                "data": data,
+                "format": format,
+                "lastUpdated": last_updated.isoformat(),
+                "dataTimestamp": data_timestamp.isoformat(),
+            },
+            separators=(",", ":"),
+        ).encode("utf-8")
 
+cache = DataCache(default_product)
+# One cache slot per enabled product; the default product's is ``cache``
+product_caches: Dict[str, DataCache] = {
+    name: cache if product.is_default else DataCache(product) for name, product in products.items()
+}
+# The default product cut to each region of interest
+region_caches: Dict[str, DataCache] = {name: DataCache(default_product, record_stages=False) for name in regions}
@@ -0,0 +1,97 @@
+import base64
+import json
+import threading
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, Optional
+from app.services.data_cache import CacheSnapshot, EncodedPayload
+from app.services.frame_history import RadarFrame, frame_history
+from app.services.radar_encoding import MISSING_CODE
+from app.utils.config import config
+
+def frame_delta(previous: RadarFrame, current: RadarFrame) -> Optional[Dict[str, Any]]:
+    """
+    Cells of the ``/api/radar/latest`` columnar grid that changed between two
+    frames, or None if they do not share that grid (the client then needs a
+    full payload).
+
+    ``changed`` is a row-major bitmap (``np.packbits`` bit order) of cells
+    whose quantized value changed, appeared or cleared, and ``values`` holds
+    each one's new code in the same order, ``MISSING_CODE`` meaning cleared.
+    """
+    stride = current.stride
+    if current.decimation * stride != config.DECIMATION_FACTOR:
+        return None
+    geometry = ("decimation", "lat0", "lon0", "dlat", "dlon")
+    if any(getattr(previous, name) != getattr(current, name) for name in geometry):
+        return None
+    before = previous.codes[::stride, ::stride]
+    after = current.codes[::stride, ::stride]
+    if before.shape != after.shape:
+        return None
+
+    changed = before != after
+    return {
+        "type": "RadarDelta",
+        "since": previous.timestamp.isoformat(),
+        "origin": [current.lon0, current.lat0],
+        "step": [current.dlon * stride, current.dlat * stride],
+        "decimation": config.DECIMATION_FACTOR,
+        "shape": list(after.shape),
+        "offset": config.QUANT_OFFSET,
+        "scale": config.QUANT_SCALE,
+        "missing": MISSING_CODE,
+        "count": int(changed.sum()),
+        "changed": base64.b64encode(np.packbits(changed).tobytes()).decode("ascii"),
+        "values": base64.b64encode(after[changed].tobytes()).decode("ascii"),
+    }
+
+class DeltaCache:
+    """
+    Encoded deltas from earlier frames to the current one.
+
+    The delta from the previous frame is built once per update; deltas from
+    older retained frames are built on first request. Entries are dropped
+    when the current frame changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._timestamp: Optional[datetime] = None
+        self._payloads: Dict[datetime, Optional[EncodedPayload]] = {}
+
+    def update(self, snapshot: CacheSnapshot):
+        """Build the delta from the frame before ``snapshot``'s, if it is retained."""
+        earlier = [frame.timestamp for frame in frame_history.frames() if frame.timestamp < snapshot.data_timestamp]
+        if earlier:
+            self.get(earlier[-1], snapshot)
+
+    def get(self, since: datetime, snapshot: CacheSnapshot) -> Optional[EncodedPayload]:
+        """The delta from frame ``since`` to ``snapshot``, or None if the client needs the full payload."""
+        with self._lock:
+            if self._timestamp != snapshot.data_timestamp:
+                self._timestamp = snapshot.data_timestamp
+                self._payloads = {}
+            if since in self._payloads:
+                return self._payloads[since]
+
+            previous = frame_history.get(since)
+            current = frame_history.get(snapshot.data_timestamp)
+            delta = frame_delta(previous, current) if previous is not None and current is not None else None
+            payload = None
+            if delta is not None:
+                body = {
+                    "data": delta,
+                    "format": "delta",
+                    "lastUpdated": snapshot.last_updated.isoformat(),
+                    "dataTimestamp": snapshot.data_timestamp.isoformat(),
+                }
+                payload = EncodedPayload(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+            # Frames missing now may be added later (the current one just
+            # after the cache swap, older ones by backfill), so only remember
+            # answers computed from both
+            if previous is not None and current is not None:
+                self._payloads[since] = payload
+            return payload
+
+delta_cache = DeltaCache()
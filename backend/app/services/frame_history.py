@@ -0,0 +1,122 @@
+import json
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from app.services.data_cache import EncodedPayload
+from app.services.grib2_parser import RadarGrid
+from app.services.radar_encoding import MISSING_CODE, quantize_masked, columnar_payload
+from app.utils.config import config
+
+FRAME_ID_FORMAT = "%Y%m%d-%H%M%S"
+
+def frame_id(timestamp: datetime) -> str:
+    """URL-safe frame key, matching the timestamp format of MRMS filenames."""
+    return timestamp.astimezone(timezone.utc).strftime(FRAME_ID_FORMAT)
+
+def parse_frame_id(value: str) -> Optional[datetime]:
+    """Accept either a frame id (``20240101-120000``) or an ISO ``dataTimestamp``."""
+    try:
+        return datetime.strptime(value, FRAME_ID_FORMAT).replace(tzinfo=timezone.utc)
+    except ValueError:
+        pass
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return timestamp if timestamp.tzinfo else timestamp.replace(tzinfo=timezone.utc)
+
+class RadarFrame:
+    """
+    One retained radar scan, quantized to uint8 codes at ``FRAME_DECIMATION``.
+
+    Invalid cells hold ``MISSING_CODE``. Row ``i`` lies at ``lat0 + i * dlat``
+    and column ``j`` at ``lon0 + j * dlon``, as in ``RadarGrid``.
+    """
+
+    __slots__ = ("timestamp", "codes", "lat0", "lon0", "dlat", "dlon", "decimation", "_payload")
+
+    def __init__(self, timestamp: datetime, codes, lat0: float, lon0: float, dlat: float, dlon: float, decimation: int):
+        self.timestamp = timestamp
+        self.codes = codes
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.dlat = dlat
+        self.dlon = dlon
+        self.decimation = decimation
+        self._payload: Optional[EncodedPayload] = None
+
+    @classmethod
+    def from_grid(cls, grid: RadarGrid, timestamp: datetime, decimation: int = config.FRAME_DECIMATION) -> "RadarFrame":
+        codes = quantize_masked(grid.values[::decimation, ::decimation])
+        return cls(timestamp, codes, grid.lat0, grid.lon0, grid.dlat * decimation, grid.dlon * decimation, decimation)
+
+    @property
+    def id(self) -> str:
+        return frame_id(self.timestamp)
+
+    @property
+    def nbytes(self) -> int:
+        return self.codes.nbytes
+
+    @property
+    def stride(self) -> int:
+        """Step through ``codes`` that gives the density of ``/api/radar/latest``."""
+        return max(1, config.DECIMATION_FACTOR // self.decimation)
+
+    def payload(self) -> EncodedPayload:
+        """Columnar payload at the same density as ``/api/radar/latest``, built on first use."""
+        if self._payload is None:
+            stride = self.stride
+            codes = self.codes[::stride, ::stride]
+            valid = codes != MISSING_CODE
+            data = columnar_payload(
+                codes, valid, self.lon0, self.lat0, self.dlon * stride, self.dlat * stride, self.decimation * stride
+            )
+            body = {"data": data, "format": "columnar", "dataTimestamp": self.timestamp.isoformat()}
+            self._payload = EncodedPayload(json.dumps(body, separators=(",", ":")).encode("utf-8"))
+        return self._payload
+
+class FrameHistory:
+    """
+    Ring buffer of the most recent frames ordered by product timestamp.
+
+    Holds at most ``max_frames`` frames and ``max_bytes`` of quantized data,
+    evicting the oldest first. Backfilled frames may arrive out of order.
+    """
+
+    def __init__(self, max_frames: int = config.FRAME_HISTORY_SIZE, max_bytes: int = config.FRAME_HISTORY_BYTES):
+        self.max_frames = max_frames
+        self.max_bytes = max_bytes
+        self._frames: Dict[datetime, RadarFrame] = {}
+
+    def add(self, frame: RadarFrame):
+        frames = dict(self._frames)
+        frames[frame.timestamp] = frame
+        ordered = sorted(frames)
+        size = sum(frames[timestamp].nbytes for timestamp in ordered)
+        while ordered and (len(ordered) > self.max_frames or size > self.max_bytes):
+            size -= frames.pop(ordered.pop(0)).nbytes
+        # Swap in a new dict so concurrent readers never see a half-evicted buffer
+        self._frames = {timestamp: frames[timestamp] for timestamp in ordered}
+
+    def get(self, timestamp: datetime) -> Optional[RadarFrame]:
+        return self._frames.get(timestamp)
+
+    def frames(self) -> List[RadarFrame]:
+        """Retained frames, oldest first."""
+        return list(self._frames.values())
+
+    def latest(self) -> Optional[RadarFrame]:
+        frames = self._frames
+        return frames[next(reversed(frames))] if frames else None
+
+    def __contains__(self, timestamp: datetime) -> bool:
+        return timestamp in self._frames
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(frame.nbytes for frame in self._frames.values())
+
+frame_history = FrameHistory()
@@ -1,104 +1,164 @@
-import json
-import subprocess
-import tempfile
-import os
-from pathlib import Path
-from typing import Dict, Any
+import math
+import numpy as np
+from typing import Dict, Any, Optional, Tuple, Union
+from app.utils.config import config
 
-def parse_grib2_to_geojson(buffer: bytes) -> Dict[str, Any]:
-    base_path = Path(__file__).parent.parent.parent
-    script_path = base_path / "test_grib2_simple.py"
-    
-    if not script_path.exists():
-        raise FileNotFoundError(f"Python parser script not found: {script_path}")
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".grib2") as temp_file:
-        temp_file.write(buffer)
-        temp_file_path = temp_file.name
-    
-    try:
-        # Set environment to suppress ECCODES warnings
-        env = os.environ.copy()
-        env['ECCODES_WARNINGS'] = '0'
-        env['ECCODES_DEBUG'] = '0'
-        
-        # Run the parser script
-        # Exit code -9 means process was killed (OOM or timeout)
-        result = subprocess.run(
-            ["python3", str(script_path), temp_file_path],
-            capture_output=True,
-            text=True,
-            timeout=300,  # Increased timeout to 5 minutes for large files
-            env=env,
-            cwd=str(base_path)
+class RadarGrid:
+    """
+    Regular lat/lon grid decoded from a single GRIB2 message.
+
+    Row ``i`` lies at ``lat0 + i * dlat`` and column ``j`` at ``lon0 + j * dlon``,
+    with longitudes normalized to -180..180. ``values`` holds the raw field as
+    float32 (missing cells keep whatever sentinel the producer used).
+    """
+
+    def __init__(self, values: np.ndarray, lat0: float, lon0: float, dlat: float, dlon: float):
+        self.values = values
+        self.lat0 = lat0
+        self.lon0 = lon0
+        self.dlat = dlat
+        self.dlon = dlon
+
+    @property
+    def shape(self) -> Tuple[int, int]:
+        return self.values.shape
+
+    def lats(self, step: int = 1) -> np.ndarray:
+        return self.lat0 + np.arange(0, self.shape[0], step) * self.dlat
+
+    def lons(self, step: int = 1) -> np.ndarray:
+        lons = self.lon0 + np.arange(0, self.shape[1], step) * self.dlon
+        return np.where(lons > 180, lons - 360, lons)
+
+    def window(self, min_lon: float, min_lat: float, max_lon: float, max_lat: float, stride: int = 1) -> Tuple[slice, slice]:
+        """
+        Row and column slices covering a bounding box, found by arithmetic on
+        the grid origin and step rather than by searching coordinates.
+
+        Slice starts are aligned to multiples of ``stride`` so that taking
+        every ``stride``-th cell of the window lands on the same lattice as
+        decimating the whole grid.
+        """
+        rows = _index_range(min_lat, max_lat, self.lat0, self.dlat, self.shape[0], stride)
+        cols = _index_range(min_lon, max_lon, self.lon0, self.dlon, self.shape[1], stride)
+        return rows, cols
+
+    def decimated(self, step: int) -> "RadarGrid":
+        """Zero-copy view of every ``step``-th row and column."""
+        if step == 1:
+            return self
+        return RadarGrid(self.values[::step, ::step], self.lat0, self.lon0, self.dlat * step, self.dlon * step)
+
+    def crop(self, rows: slice, cols: slice) -> "RadarGrid":
+        """Zero-copy view of a sub-grid with its origin shifted accordingly."""
+        return RadarGrid(
+            self.values[rows, cols],
+            lat0=self.lat0 + rows.start * self.dlat,
+            lon0=self.lon0 + cols.start * self.dlon,
+            dlat=self.dlat,
+            dlon=self.dlon,
         )
-        
-        # Handle exit code -9 (process killed)
-        if result.returncode == -9 or result.returncode == 9:
-            raise RuntimeError(
-                f"Parser process was killed (exit code {result.returncode}). "
-                f"This usually indicates out of memory or timeout. "
-                f"File size: {len(buffer) / 1024 / 1024:.2f} MB. "
-                f"Try increasing container memory limits."
-            )
-        
-        # Output file is created in the script's working directory (backend/)
-        output_file = base_path / "test_output.geojson"
-        
-        # Filter out ECCODES warnings from stderr (these are non-fatal)
-        stderr_lines = result.stderr.split('\n') if result.stderr else []
-        filtered_stderr = [
-            line for line in stderr_lines 
-            if not line.strip().startswith('ECCODES ERROR') 
-            and not 'Truncating time' in line
-            and not 'non-zero seconds' in line
-            and line.strip()  # Keep non-empty lines
-        ]
-        filtered_stderr_text = '\n'.join(filtered_stderr)
-        
-        # Log stdout and stderr for debugging
-        if result.stdout:
-            print(f"Parser stdout (last 500 chars): {result.stdout[-500:]}")
-        if result.stderr:
-            print(f"Parser stderr (last 500 chars): {result.stderr[-500:]}")
-        
-        # Check if output file was created (this indicates success)
-        if output_file.exists():
-            # Success! Warnings in stderr are OK if file was created
-            if filtered_stderr_text.strip():
-                print(f"Parser completed with warnings (non-fatal): {filtered_stderr_text[:200]}")
+
+def _index_range(lo: float, hi: float, origin: float, step: float, size: int, stride: int) -> slice:
+    a, b = sorted(((lo - origin) / step, (hi - origin) / step))
+    start = max(0, math.ceil(a))
+    start += -start % stride
+    stop = min(size, math.floor(b) + 1)
+    return slice(start, max(start, stop))
+
+def decode_grib2(
+    buffer: Union[bytes, bytearray],
+    bounds: Optional[Tuple[float, float, float, float]] = None,
+) -> RadarGrid:
+    """
+    Decode the first message of a GRIB2 buffer in-process, without touching disk.
+
+    With ``bounds`` (min_lon, min_lat, max_lon, max_lat) only that window is
+    kept: the packed field is still unpacked whole, but the returned array,
+    and everything built from it downstream, is the size of the window.
+    """
+    import eccodes
+
+    gid = eccodes.codes_new_from_message(buffer if isinstance(buffer, bytes) else bytes(buffer))
+    try:
+        ni = eccodes.codes_get(gid, "Ni")
+        nj = eccodes.codes_get(gid, "Nj")
+        lat0 = eccodes.codes_get(gid, "latitudeOfFirstGridPointInDegrees")
+        lon0 = eccodes.codes_get(gid, "longitudeOfFirstGridPointInDegrees")
+        dlat = eccodes.codes_get(gid, "jDirectionIncrementInDegrees")
+        dlon = eccodes.codes_get(gid, "iDirectionIncrementInDegrees")
+        j_positive = eccodes.codes_get(gid, "jScansPositively")
+        i_negative = eccodes.codes_get(gid, "iScansNegatively")
+        # Decode straight into float32 where eccodes can (2.30+); otherwise
+        # the float64 copy it hands back is the largest allocation of the
+        # whole cycle, so it is converted and dropped immediately.
+        if hasattr(eccodes, "codes_get_float_array"):
+            values = eccodes.codes_get_float_array(gid, "values")
         else:
-            # Output file doesn't exist - check if script failed
-            if result.returncode != 0:
-                # Script failed - show the actual error
-                error_msg = filtered_stderr_text or result.stdout
-                if error_msg.strip():
-                    raise RuntimeError(f"Python parser failed (exit code {result.returncode}): {error_msg}")
-                else:
-                    # Show both stdout and stderr if error message is empty
-                    full_output = f"stdout: {result.stdout}\nstderr: {result.stderr}"
-                    raise RuntimeError(f"Python parser failed (exit code {result.returncode}) with no error message. {full_output}")
-            else:
-                # Script returned 0 but no output file - this shouldn't happen
-                error_details = f"Return code: {result.returncode}\n"
-                error_details += f"Stdout: {result.stdout[-1000:] if result.stdout else 'empty'}\n"
-                error_details += f"Stderr: {result.stderr[-1000:] if result.stderr else 'empty'}"
-                raise FileNotFoundError(
-                    f"Python parser completed but did not generate output file at {output_file}.\n{error_details}"
-                )
-        
-        with open(output_file, 'r') as f:
-            geojson = json.load(f)
-        
-        if not geojson.get("features"):
-            raise ValueError("No features extracted from GRIB2 file")
-        
-        print(f"Extracted {len(geojson['features'])} data points from GRIB2 file")
-        return geojson
-        
+            values = eccodes.codes_get_values(gid).astype(np.float32)
+        values = values.reshape(nj, ni)
     finally:
-        try:
-            os.unlink(temp_file_path)
-        except:
-            pass
+        eccodes.codes_release(gid)
+
+    if lon0 > 180:
+        lon0 -= 360
+
+    grid = RadarGrid(
+        values,
+        lat0=lat0,
+        lon0=lon0,
+        dlat=dlat if j_positive else -dlat,
+        dlon=-dlon if i_negative else dlon,
+    )
+    if bounds is None:
+        return grid
 
+    # Align the window to the decimation lattice so cropped and uncropped
+    # grids yield the same points, then copy it out so the full field is freed
+    rows, cols = grid.window(*bounds, stride=config.DECIMATION_FACTOR)
+    if rows.start == rows.stop or cols.start == cols.stop:
+        raise ValueError(f"Regions of interest {bounds} do not overlap the grid")
+    window = grid.crop(rows, cols)
+    window.values = window.values.copy()
+    return window
+
+def extract_points(
+    grid: RadarGrid,
+    decimation: int = config.DECIMATION_FACTOR,
+    min_value: float = config.MIN_REFLECTIVITY,
+    max_value: float = config.MAX_REFLECTIVITY,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return ``(lons, lats, values)`` for every in-range cell of the decimated grid."""
+    sub = grid.values[::decimation, ::decimation]
+    mask = (sub >= min_value) & (sub <= max_value)
+    rows, cols = np.nonzero(mask)
+
+    lats = grid.lats(decimation)[rows]
+    lons = grid.lons(decimation)[cols]
+    return lons, lats, sub[rows, cols]
+
+def points_to_geojson(
+    lons: np.ndarray,
+    lats: np.ndarray,
+    values: np.ndarray,
+    property: str = "reflectivity",
+) -> Dict[str, Any]:
+    rounded = np.round(values.astype(np.float64), 1)
+    features = [
+        {
+            "type": "Feature",
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+            "properties": {property: value},
+        }
+        for lon, lat, value in zip(lons.tolist(), lats.tolist(), rounded.tolist())
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+def grid_to_geojson(grid: RadarGrid) -> Dict[str, Any]:
+    """Points of a grid; an empty ``FeatureCollection`` when there is no echo (e.g. a dry region)."""
+    geojson = points_to_geojson(*extract_points(grid))
+    print(f"Extracted {len(geojson['features'])} data points from GRIB2 file")
+    return geojson
+
+def parse_grib2_to_geojson(buffer: bytes) -> Dict[str, Any]:
+    return grid_to_geojson(decode_grib2(buffer))
@@ -0,0 +1,301 @@
+import math
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# Prometheus text exposition (format 0.0.4) without the client library: a
+# handful of counters, gauges and histograms rendered at /metrics. Metrics
+# are per process; with several workers each one reports its own.
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+SIZE_BUCKETS = tuple(256 * 4 ** power for power in range(11))
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if math.isnan(value):
+        return "NaN"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()
+        registry.append(self)
+
+    def _key(self, labels: Dict[str, str]) -> LabelValues:
+        return tuple(str(labels[name]) for name in self.labels)
+
+    def samples(self) -> List[Tuple[str, LabelValues, Sequence[str], float]]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, values, extra, value in self.samples():
+            names = self.labels + (("le",) if extra else ())
+            lines.append(f"{self.name}{suffix}{_format_labels(names, tuple(values) + tuple(extra))} {_format_value(value)}")
+        return lines
+
+class Counter(Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = ()):
+        super().__init__(name, help, labels)
+        # An unlabeled counter is exported from the start, so rate() sees its first increment
+        self._values: Dict[LabelValues, float] = {} if self.labels else {(): 0}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [("", key, (), value) for key, value in sorted(self._values.items())]
+
+class Gauge(Metric):
+    """A settable gauge, or one computed at scrape time by ``function`` (returning ``{labels: value}``)."""
+
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        labels: Sequence[str] = (),
+        function: Optional[Callable[[], Dict[LabelValues, float]]] = None,
+    ):
+        super().__init__(name, help, labels)
+        self._values: Dict[LabelValues, float] = {}
+        self._function = function
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        if self._function is not None:
+            values = self._function()
+        else:
+            with self._lock:
+                values = dict(self._values)
+        return [("", key, (), value) for key, value in sorted(values.items()) if value is not None]
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: bucket counts (non-cumulative, plus +Inf), sum
+        self._series: Dict[LabelValues, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        index = next((i for i, bound in enumerate(self.buckets) if value <= bound), len(self.buckets))
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            series = {key: (list(counts), total[0]) for key, (counts, total) in self._series.items()}
+        for key, (counts, total) in sorted(series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                samples.append(("_bucket", key, (_format_value(bound),), cumulative))
+            samples.append(("_sum", key, (), total))
+            samples.append(("_count", key, (), cumulative))
+        return samples
+
+registry: List[Metric] = []
+
+def render() -> str:
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+# Refresh pipeline
+STAGE_SECONDS = Histogram(
+    "radar_update_stage_seconds",
+    "Duration of each stage of a product's radar refresh.",
+    ("product", "stage"),
+)
+STAGE_LAST_SECONDS = Gauge(
+    "radar_update_stage_last_seconds",
+    "Duration of the most recent run of each refresh stage, per product.",
+    ("product", "stage"),
+)
+UPDATES = Counter(
+    "radar_updates_total",
+    "Refresh cycles per product by outcome (updated, unchanged or error).",
+    ("product", "result"),
+)
+DOWNLOAD_RETRIES = Counter("radar_download_retries_total", "MRMS fetch attempts that failed and were retried.")
+DOWNLOAD_BYTES = Counter(
+    "radar_download_bytes_total",
+    "Bytes of GRIB2 downloaded, as transferred and after gunzip.",
+    ("kind",),
+)
+LAST_DOWNLOAD_BYTES = Gauge(
+    "radar_last_download_bytes",
+    "Size of the most recent GRIB2 download, as transferred and after gunzip.",
+    ("kind",),
+)
+FEATURES = Gauge("radar_features", "Points in the latest point payload.")
+PUBLISH_PERIOD = Gauge("radar_publish_period_seconds", "Learned spacing between MRMS scans.")
+PUBLISH_LAG = Gauge("radar_publish_lag_seconds", "Learned delay from an MRMS product time to its appearance in the listing.")
+NEXT_POLL = Gauge("radar_next_poll_delay_seconds", "Delay the scheduler chose before its next poll.")
+
+@contextmanager
+def timed(stage: str, product: Optional[str]):
+    """Record how long the body takes as stage ``stage`` of ``product``'s refresh."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start, product)
+
+def observe_stage(stage: str, seconds: float, product: Optional[str]):
+    """
+    Record one run of a refresh stage. Work outside a product's refresh
+    (frame backfill, region caches) passes ``product=None`` and is not
+    recorded, so each product's stages describe one pipeline.
+    """
+    if product is None:
+        return
+    STAGE_SECONDS.observe(seconds, product=product, stage=stage)
+    STAGE_LAST_SECONDS.set(seconds, product=product, stage=stage)
+
+# State read at scrape time
+def _data_age():
+    from app.services.data_cache import cache
+
+    timestamp = cache.data_timestamp
+    if timestamp is None:
+        return {}
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return {(): (datetime.now(timezone.utc) - timestamp).total_seconds()}
+
+def _last_update():
+    from app.services.data_cache import cache
+
+    return {(): cache.last_updated.timestamp()} if cache.last_updated else {}
+
+def _payload_bytes():
+    from app.services.data_cache import cache
+
+    values = {}
+    for format, payload in cache.payloads.items():
+        for encoding in ("body", "gzip", "brotli"):
+            data = getattr(payload, encoding)
+            if data is not None:
+                values[(format, "identity" if encoding == "body" else encoding)] = len(data)
+    return values
+
+def _frames():
+    from app.services.frame_history import frame_history
+
+    return {(): len(frame_history)}
+
+def _subscribers():
+    from app.services.broadcaster import broadcaster
+
+    return {(): len(broadcaster)}
+
+def _peak_rss():
+    from app.services.parse_worker import parse_worker
+
+    values = {("api",): resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024}
+    if parse_worker.peak_rss is not None:
+        values[("parse_worker",)] = parse_worker.peak_rss
+    return values
+
+def _startup():
+    from app.services.startup import startup_timer
+
+    return {(phase,): seconds for phase, seconds in startup_timer.phases().items()}
+
+Gauge("radar_data_age_seconds", "Age of the served radar product (now minus its timestamp).", function=_data_age)
+Gauge("radar_last_update_timestamp_seconds", "Unix time the cache was last refreshed.", function=_last_update)
+Gauge("radar_payload_bytes", "Size of each cached payload per content encoding.", ("format", "encoding"), function=_payload_bytes)
+Gauge("radar_frames", "Frames retained for loop animation.", function=_frames)
+Gauge("radar_stream_subscribers", "Connected /api/radar/stream clients.", function=_subscribers)
+Gauge("radar_startup_seconds", "Seconds from process start to each startup phase.", ("phase",), function=_startup)
+Gauge("radar_peak_rss_bytes", "Peak resident memory of the API process and of the parse worker's last decode.", ("process",), function=_peak_rss)
+
+# HTTP
+REQUEST_SECONDS = Histogram(
+    "radar_http_request_duration_seconds",
+    "Time to serve radar API requests, until the last body byte is sent.",
+    ("route", "method", "status"),
+    buckets=LATENCY_BUCKETS,
+)
+RESPONSE_BYTES = Histogram(
+    "radar_http_response_size_bytes",
+    "Body size of radar API responses as sent (after compression).",
+    ("route", "method"),
+    buckets=SIZE_BUCKETS,
+)
+
+class MetricsMiddleware:
+    """
+    ASGI middleware timing ``/api/radar`` requests by route template.
+
+    The event stream is skipped: its duration is the length of the
+    connection, not a latency.
+    """
+
+    def __init__(self, app, prefix: str = "/api/radar", exclude: Sequence[str] = ("/api/radar/stream",)):
+        self.app = app
+        self.prefix = prefix
+        self.exclude = set(exclude)
+
+    async def __call__(self, scope, receive, send):
+        path = scope.get("path", "")
+        if scope["type"] != "http" or not path.startswith(self.prefix) or path in self.exclude:
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        status = [500]
+        size = [0]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            elif message["type"] == "http.response.body":
+                size[0] += len(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            template = getattr(route, "path_format", None) or "unmatched"
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=template, method=scope["method"], status=status[0])
+            RESPONSE_BYTES.observe(size[0], route=template, method=scope["method"])
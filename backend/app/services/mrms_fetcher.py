@@ -1,149 +1,288 @@
-import requests
-import gzip
+import asyncio
 import time
-from io import BytesIO
-from datetime import datetime
+import zlib
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import TYPE_CHECKING, Optional, Dict, List, Tuple
+from app.services import metrics
 from app.utils.config import config
 import re
 
-def get_latest_file_url() -> str:
-    base_url = f"{config.MRMS_BASE_URL}{config.MRMS_RALA_PATH}"
-    
-    try:
-        response = requests.get(
-            base_url,
-            timeout=10,
-            headers={"User-Agent": "Mozilla/5.0 (compatible; WeatherRadar/1.0)"}
+if TYPE_CHECKING:
+    import httpx
+
+GZIP_MAGIC = b"\x1f\x8b"
+PRODUCT_TIMESTAMP_PATTERN = re.compile(r"_(\d{8})-(\d{6})\.grib2")
+
+_client: Optional["httpx.AsyncClient"] = None
+
+def get_client() -> "httpx.AsyncClient":
+    """Shared keep-alive client so the listing and the download reuse one connection pool."""
+    global _client
+    if _client is None or _client.is_closed:
+        # Imported on first use: workers that only serve never need it
+        import httpx
+
+        _client = httpx.AsyncClient(
+            headers={
+                "User-Agent": "Mozilla/5.0 (compatible; WeatherRadar/1.0)",
+                # The file is already gzipped; asking for transfer compression on
+                # top of it can make the server double-compress or truncate
+                "Accept-Encoding": "identity",
+            },
+            timeout=httpx.Timeout(120, connect=10),
+            limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+            follow_redirects=True,
         )
-        response.raise_for_status()
-        
-        html = response.text
-        
-        latest_file_pattern = r'href="([^"]*MRMS_ReflectivityAtLowestAltitude\.latest\.grib2\.gz)"'
-        latest_match = re.search(latest_file_pattern, html, re.IGNORECASE)
-        
-        if latest_match:
-            latest_file = latest_match.group(1)
-            print(f"Found .latest file: {latest_file}")
-            if latest_file.startswith("http"):
-                return latest_file
-            elif latest_file.startswith("/"):
-                return f"{config.MRMS_BASE_URL}{latest_file}"
-            else:
-                return f"{base_url}{latest_file}"
-        
-        patterns = [
-            r'href="([^"]+\.grib2\.gz)"',
-            r"href='([^']+\.grib2\.gz)'",
-        ]
-        
-        files = set()
-        for pattern in patterns:
-            matches = re.finditer(pattern, html, re.IGNORECASE)
-            for match in matches:
-                filename = match.group(1).strip()
-                if filename.endswith(".grib2.gz") and "Parent" not in filename:
-                    files.add(filename)
-        
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+class SourceFingerprint:
+    """Identity of a downloaded MRMS file, used to skip re-processing it."""
+
+    __slots__ = ("url", "filename", "etag", "last_modified")
+
+    def __init__(self, url: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self.url = url
+        self.filename = url.rsplit("/", 1)[-1]
+        self.etag = etag
+        self.last_modified = last_modified
+
+    def to_dict(self) -> Dict[str, Optional[str]]:
+        return {"url": self.url, "etag": self.etag, "last_modified": self.last_modified}
+
+# Per product directory: validators of the last listing and the last file that
+# made it into the cache, replayed as If-None-Match / If-Modified-Since
+_listings: Dict[str, Dict[str, Optional[str]]] = {}
+_processed: Dict[str, SourceFingerprint] = {}
+
+def _conditional_headers(etag: Optional[str], last_modified: Optional[str]) -> Dict[str, str]:
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if last_modified:
+        headers["If-Modified-Since"] = last_modified
+    return headers
+
+def parse_product_timestamp(filename: str) -> Optional[datetime]:
+    """Product time encoded in MRMS filenames, e.g. ``..._00.50_20240101-120000.grib2.gz``."""
+    match = PRODUCT_TIMESTAMP_PATTERN.search(filename)
+    if not match:
+        return None
+    return datetime.strptime(match.group(1) + match.group(2), "%Y%m%d%H%M%S").replace(tzinfo=timezone.utc)
+
+def remember_source(fingerprint: Optional[SourceFingerprint], path: str = config.MRMS_RALA_PATH):
+    """Record a file as processed so later cycles can short-circuit on it."""
+    if fingerprint is None:
+        _processed.pop(path, None)
+    else:
+        _processed[path] = fingerprint
+
+async def fetch_listing_html(path: str = config.MRMS_RALA_PATH, product: Optional[str] = None) -> str:
+    base_url = f"{config.MRMS_BASE_URL}{path}"
+    listing = _listings.setdefault(path, {"html": None, "etag": None, "last_modified": None})
+    headers = _conditional_headers(listing["etag"], listing["last_modified"]) if listing["html"] else {}
+
+    with metrics.timed("list", product):
+        response = await get_client().get(base_url, timeout=10, headers=headers)
+    if response.status_code == 304:
+        return listing["html"]
+    response.raise_for_status()
+
+    listing.update(
+        html=response.text,
+        etag=response.headers.get("ETag"),
+        last_modified=response.headers.get("Last-Modified"),
+    )
+    return response.text
+
+def _resolve_url(href: str, path: str = config.MRMS_RALA_PATH) -> str:
+    base_url = f"{config.MRMS_BASE_URL}{path}"
+    if href.startswith("http"):
+        return href
+    elif href.startswith("/"):
+        return f"{config.MRMS_BASE_URL}{href}"
+    return f"{base_url}{href}"
+
+def list_grib2_files(html: str) -> List[str]:
+    """All ``.grib2.gz`` hrefs in a directory listing, newest first."""
+    patterns = [
+        r'href="([^"]+\.grib2\.gz)"',
+        r"href='([^']+\.grib2\.gz)'",
+    ]
+
+    files = set()
+    for pattern in patterns:
+        matches = re.finditer(pattern, html, re.IGNORECASE)
+        for match in matches:
+            filename = match.group(1).strip()
+            if filename.endswith(".grib2.gz") and "Parent" not in filename:
+                files.add(filename)
+
+    return sorted(files, reverse=True)
+
+async def list_recent_files(limit: int, path: str = config.MRMS_RALA_PATH) -> List[Tuple[str, datetime]]:
+    """URLs and product times of the newest ``limit`` timestamped files, newest first."""
+    html = await fetch_listing_html(path)
+    recent = []
+    for name in list_grib2_files(html):
+        timestamp = parse_product_timestamp(name)
+        if timestamp is not None:
+            recent.append((_resolve_url(name, path), timestamp))
+        if len(recent) == limit:
+            break
+    return recent
+
+async def get_latest_file_url(path: str = config.MRMS_RALA_PATH, product: Optional[str] = None) -> str:
+    """
+    Resolve the newest file in the MRMS directory.
+
+    Timestamped files are preferred over the ``.latest`` alias: their names
+    never change content, so the name alone fingerprints the data and
+    carries the real product time.
+    """
+    try:
+        html = await fetch_listing_html(path, product)
+        files = list_grib2_files(html)
+
         if not files:
             print(f"HTML response sample: {html[:1000]}")
             raise ValueError("No GRIB2 files found in directory listing")
-        
-        file_array = sorted(files, reverse=True)
-        latest_file = file_array[0]
-        
-        if latest_file.startswith("http"):
-            file_url = latest_file
-        elif latest_file.startswith("/"):
-            file_url = f"{config.MRMS_BASE_URL}{latest_file}"
-        else:
-            file_url = f"{base_url}{latest_file}"
-        
+
+        timestamped = [name for name in files if parse_product_timestamp(name)]
+        latest_file = timestamped[0] if timestamped else files[0]
+
         print(f"Found {len(files)} GRIB2 files, using: {latest_file}")
-        return file_url
-        
+        return _resolve_url(latest_file, path)
+
     except Exception as e:
         print(f"Error fetching MRMS file list: {e}")
         raise
 
-def fetch_latest_rala_file() -> tuple[bytes, datetime]:
+async def download_grib2(
+    file_url: str,
+    headers: Optional[Dict[str, str]] = None,
+    product: Optional[str] = None,
+) -> Optional[Tuple[bytearray, SourceFingerprint]]:
+    """
+    Stream a (possibly gzipped) GRIB2 file, inflating chunks as they arrive.
+
+    Only the decompressed bytes are kept: each network chunk is fed straight
+    into a ``zlib`` decompressor and appended to a single growing buffer.
+    Returns ``None`` when the server answers a conditional request with 304.
+    Stage timings are recorded under ``product`` (see ``metrics.observe_stage``).
+    """
+    start = time.perf_counter()
+    async with get_client().stream("GET", file_url, headers=headers) as response:
+        if response.status_code == 304:
+            return None
+        response.raise_for_status()
+        fingerprint = SourceFingerprint(
+            file_url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified"),
+        )
+
+        content_length = response.headers.get('Content-Length')
+        if content_length:
+            print(f"Expected file size: {int(content_length) / 1024 / 1024:.2f} MB")
+
+        buffer = bytearray()
+        decompressor = None
+        downloaded = 0
+        inflate_seconds = 0.0
+
+        async for chunk in response.aiter_raw():
+            if not chunk:
+                continue
+            if decompressor is None and downloaded == 0:
+                if chunk[:2] == GZIP_MAGIC:
+                    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                else:
+                    print("Warning: File is not gzipped, using as-is")
+            downloaded += len(chunk)
+            inflate_start = time.perf_counter()
+            buffer += decompressor.decompress(chunk) if decompressor else chunk
+            inflate_seconds += time.perf_counter() - inflate_start
+
+        if decompressor is not None:
+            buffer += decompressor.flush()
+            if not decompressor.eof:
+                raise ValueError(f"Truncated gzip stream after {downloaded} bytes")
+
+    # Inflating overlaps the transfer; "download" covers both
+    metrics.observe_stage("download", time.perf_counter() - start, product)
+    metrics.observe_stage("decompress", inflate_seconds, product)
+    for kind, size in (("compressed", downloaded), ("decompressed", len(buffer))):
+        metrics.DOWNLOAD_BYTES.inc(size, kind=kind)
+        metrics.LAST_DOWNLOAD_BYTES.set(size, kind=kind)
+    print(f"Downloaded {downloaded / 1024 / 1024:.2f} MB")
+
+    # GRIB2 files should be at least a few KB
+    if downloaded < 1000:
+        raise ValueError(f"Downloaded file too small: {downloaded} bytes")
+    if len(buffer) < 1000:
+        raise ValueError(f"Decompressed file too small: {len(buffer)} bytes")
+
+    print(f"Decompressed to {len(buffer) / 1024 / 1024:.2f} MB")
+    return buffer, fingerprint
+
+async def fetch_latest_rala_file() -> Optional[Tuple[bytearray, datetime, SourceFingerprint]]:
+    """Fetch the latest RALA GRIB2 file from MRMS (see ``fetch_latest_file``)."""
+    return await fetch_latest_file(config.MRMS_RALA_PATH, config.DEFAULT_PRODUCT)
+
+async def fetch_latest_file(path: str, product: Optional[str] = None) -> Optional[Tuple[bytearray, datetime, SourceFingerprint]]:
     """
-    Fetch the latest RALA GRIB2 file from MRMS.
-    Retries up to 3 times if download fails or is incomplete.
+    Fetch the newest GRIB2 file of the MRMS product directory ``path``.
+
+    Returns ``None`` without downloading anything when the newest file is the
+    one already processed (same name, or a 304 on a conditional request).
+    Call ``remember_source`` with the returned fingerprint and ``path`` once
+    the data is cached. Listing and download stages are timed under
+    ``product``. Retries up to 3 times with exponential backoff if download fails
+    or is incomplete.
     """
     max_retries = 3
     retry_delay = 5
-    
+
     for attempt in range(max_retries):
         try:
-            file_url = get_latest_file_url()
+            file_url = await get_latest_file_url(path, product)
+            filename = file_url.rsplit("/", 1)[-1]
+            timestamp = parse_product_timestamp(filename)
+
+            headers = None
+            processed = _processed.get(path)
+            if processed is not None and processed.url == file_url:
+                if timestamp is not None:
+                    print(f"Source unchanged ({filename}), skipping download")
+                    return None
+                headers = _conditional_headers(processed.etag, processed.last_modified)
+
             print(f"Downloading from: {file_url} (attempt {attempt + 1}/{max_retries})")
-            
-            # Don't use Accept-Encoding: gzip - the file is already gzipped
-            # Using it might cause the server to double-compress or send incomplete data
-            response = requests.get(
-                file_url,
-                timeout=120,  # Increased timeout for large files
-                headers={"User-Agent": "Mozilla/5.0 (compatible; WeatherRadar/1.0)"},
-                stream=True  # Stream download to handle large files better
-            )
-            response.raise_for_status()
-            
-            # Check content length if available
-            content_length = response.headers.get('Content-Length')
-            if content_length:
-                print(f"Expected file size: {int(content_length) / 1024 / 1024:.2f} MB")
-            
-            # Download content
-            content = b''
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    content += chunk
-            
-            print(f"Downloaded {len(content) / 1024 / 1024:.2f} MB")
-            
-            # Verify we got some data
-            if len(content) < 1000:  # GRIB2 files should be at least a few KB
-                raise ValueError(f"Downloaded file too small: {len(content)} bytes")
-            
-            # Try to decompress
-            try:
-                compressed_data = BytesIO(content)
-                with gzip.open(compressed_data, 'rb') as f:
-                    decompressed_data = f.read()
-                
-                print(f"Decompressed to {len(decompressed_data) / 1024 / 1024:.2f} MB")
-                
-                if len(decompressed_data) < 1000:
-                    raise ValueError(f"Decompressed file too small: {len(decompressed_data)} bytes")
-                
-                return decompressed_data, datetime.now()
-                
-            except gzip.BadGzipFile as e:
-                # File might not be gzipped, try using it directly
-                print(f"Warning: File might not be gzipped, using as-is: {e}")
-                return content, datetime.now()
-            except Exception as e:
-                if attempt < max_retries - 1:
-                    print(f"Decompression error (attempt {attempt + 1}): {e}, retrying...")
-                    time.sleep(retry_delay)
-                    continue
-                raise
-            
-        except requests.exceptions.RequestException as e:
-            if attempt < max_retries - 1:
-                print(f"Download error (attempt {attempt + 1}): {e}, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
-                continue
-            print(f"Error fetching RALA file after {max_retries} attempts: {e}")
-            raise
+            result = await download_grib2(file_url, headers=headers, product=product)
+            if result is None:
+                print(f"Source not modified ({filename}), skipping")
+                return None
+
+            buffer, fingerprint = result
+            if timestamp is None and fingerprint.last_modified:
+                timestamp = parsedate_to_datetime(fingerprint.last_modified)
+            return buffer, timestamp or datetime.now(timezone.utc), fingerprint
+
         except Exception as e:
             if attempt < max_retries - 1:
-                print(f"Error (attempt {attempt + 1}): {e}, retrying in {retry_delay}s...")
-                time.sleep(retry_delay)
+                metrics.DOWNLOAD_RETRIES.inc()
+                delay = retry_delay * 2 ** attempt
+                print(f"Download error (attempt {attempt + 1}): {e}, retrying in {delay}s...")
+                await asyncio.sleep(delay)
                 continue
-            print(f"Error fetching RALA file after {max_retries} attempts: {e}")
+            print(f"Error fetching {path} after {max_retries} attempts: {e}")
             raise
-    
-    raise RuntimeError(f"Failed to fetch RALA file after {max_retries} attempts")
 
+    raise RuntimeError(f"Failed to fetch {path} after {max_retries} attempts")
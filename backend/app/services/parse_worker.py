@@ -0,0 +1,180 @@
+import asyncio
+import multiprocessing
+import numpy as np
+import os
+import uuid
+from multiprocessing.shared_memory import SharedMemory
+from typing import Optional, Tuple, Union
+from app.services.grib2_parser import RadarGrid
+from app.services.regions import crop_bounds
+from app.utils.config import config
+
+# How often the RSS watchdog samples the worker while a job is running
+RSS_POLL_INTERVAL = 0.25
+
+def _worker_main(conn):
+    """
+    Long-lived decode loop. eccodes and NumPy are imported once here so each
+    job only pays for the decode itself.
+
+    Jobs arrive as ``(shm_name, size, out_path, bounds)``: the GRIB2 bytes are
+    read from shared memory and the decoded field, cropped to ``bounds`` if
+    set, is written as an ``.npy`` file the API process memory-maps, so
+    neither side pickles a large array.
+    """
+    os.environ["ECCODES_WARNINGS"] = "0"
+    os.environ["ECCODES_DEBUG"] = "0"
+    import eccodes  # noqa: F401  (warm the decoder)
+    from app.services.grib2_parser import decode_grib2
+
+    while True:
+        try:
+            job = conn.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        shm_name, size, out_path, bounds = job
+        try:
+            shm = SharedMemory(name=shm_name)
+            try:
+                grid = decode_grib2(bytes(shm.buf[:size]), bounds)
+            finally:
+                shm.close()
+            np.save(out_path, grid.values, allow_pickle=False)
+            conn.send(("ok", {"lat0": grid.lat0, "lon0": grid.lon0, "dlat": grid.dlat, "dlon": grid.dlon}))
+        except Exception as error:
+            conn.send(("error", f"{type(error).__name__}: {error}"))
+
+def _read_peak_rss(pid: int) -> Optional[int]:
+    """Peak resident set size of ``pid`` (Linux ``VmHWM``), so spikes between samples are not missed."""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+class ParseWorker:
+    """
+    Runs GRIB2 decoding in a dedicated child process.
+
+    The child is started lazily, reused across refreshes, and killed and
+    replaced if it exceeds ``max_rss`` bytes, takes longer than ``timeout``
+    seconds or dies, so a decoder failure never takes the API process down.
+    Grids are cropped to ``bounds`` (the regions of interest) in the child.
+    """
+
+    def __init__(
+        self,
+        timeout: float = config.PARSE_TIMEOUT,
+        max_rss: int = config.PARSE_MAX_RSS,
+        bounds: Optional[Tuple[float, float, float, float]] = None,
+    ):
+        self.timeout = timeout
+        self.max_rss = max_rss
+        self.bounds = bounds
+        self._context = multiprocessing.get_context("spawn")
+        self._process = None
+        self._conn = None
+        self._lock = asyncio.Lock()
+        # Peak RSS of the worker after its last successful decode, for /metrics
+        self.peak_rss: Optional[int] = None
+
+    def start(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(target=_worker_main, args=(child_conn,), name="grib2-parse-worker", daemon=True)
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def stop(self):
+        if self._process is None:
+            return
+        try:
+            self._conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self._process.join(timeout=5)
+        self._kill()
+
+    def _kill(self):
+        if self._process is not None and self._process.is_alive():
+            self._process.kill()
+            self._process.join()
+        if self._conn is not None:
+            self._conn.close()
+        self._process = None
+        self._conn = None
+
+    async def decode(self, buffer: Union[bytes, bytearray]) -> RadarGrid:
+        """Decode a GRIB2 buffer in the worker and return a grid backed by a read-only memory map."""
+        async with self._lock:
+            self.start()
+            shm = SharedMemory(create=True, size=len(buffer))
+            out_path = os.path.join(config.PARSE_SCRATCH_DIR, f"radar-grid-{uuid.uuid4().hex}.npy")
+            try:
+                shm.buf[:len(buffer)] = buffer
+                self._conn.send((shm.name, len(buffer), out_path, self.bounds))
+                status, result = await self._wait_for_result()
+                if status != "ok":
+                    raise RuntimeError(f"GRIB2 decode failed in parse worker: {result}")
+                # Unlinking right away is safe: the mapping keeps the pages alive
+                values = np.load(out_path, mmap_mode="r")
+                return RadarGrid(values, **result)
+            finally:
+                shm.close()
+                shm.unlink()
+                try:
+                    os.unlink(out_path)
+                except FileNotFoundError:
+                    pass
+
+    async def _wait_for_result(self):
+        loop = asyncio.get_running_loop()
+        ready = loop.create_future()
+        fd = self._conn.fileno()
+        loop.add_reader(fd, lambda: ready.done() or ready.set_result(None))
+        deadline = loop.time() + self.timeout
+        try:
+            while not ready.done():
+                if loop.time() > deadline:
+                    self._kill()
+                    raise RuntimeError(f"Parse worker timed out after {self.timeout}s and was restarted")
+                rss = _read_peak_rss(self._process.pid)
+                if rss is not None and rss > self.max_rss:
+                    self._kill()
+                    raise RuntimeError(
+                        f"Parse worker exceeded memory ceiling ({rss / 1024 / 1024:.0f} MB > "
+                        f"{self.max_rss / 1024 / 1024:.0f} MB) and was restarted"
+                    )
+                await asyncio.wait([ready], timeout=RSS_POLL_INTERVAL)
+        finally:
+            loop.remove_reader(fd)
+
+        try:
+            result = self._conn.recv()
+        except (EOFError, OSError):
+            self._process.join(timeout=5)
+            exitcode = self._process.exitcode
+            self._kill()
+            raise RuntimeError(
+                f"Parse worker died (exit code {exitcode}). "
+                f"This usually indicates out of memory; it will be restarted on the next refresh."
+            )
+
+        rss = _read_peak_rss(self._process.pid)
+        self.peak_rss = rss
+        if rss is not None and rss > self.max_rss:
+            # The job finished, but its peak crossed the ceiling: recycle the
+            # worker so the next decode starts from a fresh, small process
+            print(f"Parse worker peaked at {rss / 1024 / 1024:.0f} MB, restarting it")
+            self._kill()
+        return result
+
+parse_worker = ParseWorker(bounds=crop_bounds)
@@ -0,0 +1,74 @@
+import numpy as np
+from typing import Any, Dict, List, Optional, Tuple
+from app.services.data_cache import cache
+from app.services.frame_history import frame_history
+from app.services.grib2_parser import RadarGrid
+from app.services.radar_encoding import dequantize
+from app.utils.config import config
+
+def grid_indices(
+    lats: np.ndarray,
+    lons: np.ndarray,
+    lat0: float,
+    lon0: float,
+    dlat: float,
+    dlon: float,
+    shape: Tuple[int, int],
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Nearest cell of every location on a regular grid, by arithmetic on the
+    origin and step. Returns ``(rows, cols, inside)``; indices of locations
+    off the grid are clamped and flagged False in ``inside``.
+    """
+    # Measure longitude eastward (or westward) from the origin modulo 360, so
+    # -100 and 260 land on the same column whatever convention the grid uses
+    offsets = (lons - lon0) % 360 if dlon > 0 else -((lon0 - lons) % 360)
+    rows = np.rint((lats - lat0) / dlat).astype(np.int64)
+    cols = np.rint(offsets / dlon).astype(np.int64)
+    inside = (rows >= 0) & (rows < shape[0]) & (cols >= 0) & (cols < shape[1])
+    return np.clip(rows, 0, shape[0] - 1), np.clip(cols, 0, shape[1] - 1), inside
+
+def _valid(values: np.ndarray, inside: np.ndarray) -> np.ndarray:
+    valid = inside & (values >= config.MIN_REFLECTIVITY) & (values <= config.MAX_REFLECTIVITY)
+    return np.where(valid, values, np.nan)
+
+def sample_latest(lats: np.ndarray, lons: np.ndarray, grid: Optional[RadarGrid] = None) -> Optional[np.ndarray]:
+    """Reflectivity of ``grid`` (the latest full-resolution one by default) at each location; NaN where there is none."""
+    grid = grid if grid is not None else cache.snapshot.grid
+    if grid is None:
+        return None
+    rows, cols, inside = grid_indices(lats, lons, grid.lat0, grid.lon0, grid.dlat, grid.dlon, grid.shape)
+    return _valid(grid.values[rows, cols].astype(np.float64), inside)
+
+def sample_history(lats: np.ndarray, lons: np.ndarray) -> List[Tuple[Any, np.ndarray]]:
+    """``(frame, values)`` for every retained frame, oldest first, sampled at frame resolution."""
+    history = []
+    for frame in frame_history.frames():
+        rows, cols, inside = grid_indices(lats, lons, frame.lat0, frame.lon0, frame.dlat, frame.dlon, frame.codes.shape)
+        history.append((frame, _valid(dequantize(frame.codes[rows, cols]).astype(np.float64), inside)))
+    return history
+
+def to_json(values: np.ndarray) -> List[Optional[float]]:
+    return [None if value != value else value for value in np.round(values, 2).tolist()]
+
+def query_points(lats: np.ndarray, lons: np.ndarray, history: bool = True) -> Optional[Dict[str, Any]]:
+    """
+    Columnar answer for many locations: ``reflectivity[i]`` belongs to
+    ``(lats[i], lons[i])``, and ``history.reflectivity[k][i]`` to the same
+    location in frame ``history.timestamps[k]``.
+    """
+    snapshot = cache.snapshot
+    latest = sample_latest(lats, lons, snapshot.grid)
+    if latest is None:
+        return None
+    result = {
+        "dataTimestamp": snapshot.data_timestamp.isoformat(),
+        "reflectivity": to_json(latest),
+    }
+    if history:
+        frames = sample_history(lats, lons)
+        result["history"] = {
+            "timestamps": [frame.timestamp.isoformat() for frame, _ in frames],
+            "reflectivity": [to_json(values) for _, values in frames],
+        }
+    return result
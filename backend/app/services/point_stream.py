@@ -0,0 +1,49 @@
+import numpy as np
+from typing import Iterator
+from app.services.grib2_parser import RadarGrid, extract_points
+from app.services.products import RadarProduct
+from app.utils.config import config
+
+# Line framing and media type per streaming format: newline-delimited JSON,
+# or a GeoJSON text sequence (RFC 8142, each record led by an RS character)
+FORMATS = {
+    "ndjson": ("", "application/x-ndjson"),
+    "geojsonseq": ("\x1e", "application/geo+json-seq"),
+}
+
+def row_bands(grid: RadarGrid, decimation: int, band_cells: int = config.STREAM_BAND_CELLS) -> Iterator[RadarGrid]:
+    """
+    Consecutive row bands of ``grid`` holding about ``band_cells`` decimated
+    cells each. Band starts are multiples of ``decimation``, so decimating
+    each band lands on the same lattice as decimating the whole grid.
+    An empty grid (a window off the grid) yields no bands.
+    """
+    if 0 in grid.shape:
+        return
+    columns = -(-grid.shape[1] // decimation)
+    band_rows = max(1, band_cells // columns) * decimation
+    for start in range(0, grid.shape[0], band_rows):
+        yield grid.crop(slice(start, min(start + band_rows, grid.shape[0])), slice(0, grid.shape[1]))
+
+def _feature_lines(lons: np.ndarray, lats: np.ndarray, values: np.ndarray, property: str, prefix: str) -> bytes:
+    # Same members and number formatting as points_to_geojson, one Feature per line
+    rounded = np.round(values.astype(np.float64), 1)
+    return "".join(
+        f'{prefix}{{"type":"Feature","geometry":{{"type":"Point","coordinates":[{lon},{lat}]}},'
+        f'"properties":{{"{property}":{value}}}}}\n'
+        for lon, lat, value in zip(lons.tolist(), lats.tolist(), rounded.tolist())
+    ).encode("utf-8")
+
+def stream_points(grid: RadarGrid, product: RadarProduct, decimation: int, min_value: float, format: str) -> Iterator[bytes]:
+    """
+    Yield the points of ``grid`` as GeoJSON Features, one row band at a time.
+
+    Only one band's mask, coordinates and text exist at once, so memory
+    stays bounded by ``STREAM_BAND_CELLS`` whatever the decimation; the
+    grid itself is the cache's memory map and is paged in band by band.
+    """
+    prefix = FORMATS[format][0]
+    for band in row_bands(grid, decimation):
+        lons, lats, values = extract_points(band, decimation, product.clamp_min(min_value), product.max_value)
+        if len(values):
+            yield _feature_lines(lons, lats, values, product.property, prefix)
@@ -0,0 +1,76 @@
+from typing import Any, Dict, Optional
+from app.services.grib2_parser import RadarGrid, extract_points, points_to_geojson
+from app.services.radar_encoding import encode_columnar
+from app.utils.config import config
+
+class RadarProduct:
+    """
+    One MRMS field served by the API, as configured in ``config.PRODUCTS``.
+
+    Products share the HTTP client, the parse worker and the payload
+    encoding; only the directory, value range and quantization differ.
+    """
+
+    __slots__ = ("name", "path", "units", "property", "min_value", "max_value", "offset", "scale", "decimation")
+
+    def __init__(
+        self,
+        name: str,
+        path: str,
+        units: str,
+        property: str,
+        min_value: float,
+        max_value: float,
+        offset: float,
+        scale: float,
+        decimation: int,
+    ):
+        if offset + 254 * scale < max_value:
+            raise ValueError(f"Product {name}: quantization tops out below max_value {max_value}")
+        self.name = name
+        self.path = path
+        self.units = units
+        self.property = property
+        self.min_value = min_value
+        self.max_value = max_value
+        self.offset = offset
+        self.scale = scale
+        self.decimation = decimation
+
+    @property
+    def is_default(self) -> bool:
+        return self.name == config.DEFAULT_PRODUCT
+
+    def clamp_min(self, min_value: Optional[float]) -> float:
+        """A query's lower bound, never below the product's valid range."""
+        return self.min_value if min_value is None else max(min_value, self.min_value)
+
+    def geojson(self, grid: RadarGrid, decimation: Optional[int] = None, min_value: Optional[float] = None) -> Dict[str, Any]:
+        points = extract_points(grid, decimation or self.decimation, self.clamp_min(min_value), self.max_value)
+        return points_to_geojson(*points, property=self.property)
+
+    def columnar(self, grid: RadarGrid, decimation: Optional[int] = None, min_value: Optional[float] = None) -> Dict[str, Any]:
+        return encode_columnar(
+            grid, decimation or self.decimation, self.clamp_min(min_value), self.max_value, self.offset, self.scale
+        )
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "units": self.units,
+            "property": self.property,
+            "minValue": self.min_value,
+            "maxValue": self.max_value,
+            "default": self.is_default,
+            "url": f"/api/radar/{self.name}/latest",
+        }
+
+def _load_products() -> Dict[str, RadarProduct]:
+    enabled = set(config.ENABLED_PRODUCTS) | {config.DEFAULT_PRODUCT}
+    unknown = enabled - set(config.PRODUCTS)
+    if unknown:
+        raise ValueError(f"Unknown radar products: {', '.join(sorted(unknown))}")
+    return {name: RadarProduct(name, **spec) for name, spec in config.PRODUCTS.items() if name in enabled}
+
+products = _load_products()
+default_product = products[config.DEFAULT_PRODUCT]
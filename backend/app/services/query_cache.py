@@ -0,0 +1,55 @@
+import asyncio
+from typing import Dict, Hashable, Optional, Tuple
+from fastapi.concurrency import run_in_threadpool
+from app.services.data_cache import CacheSnapshot, DataCache, EncodedPayload
+from app.services.tile_cache import TileCache
+from app.utils.config import config
+
+class QueryCache:
+    """
+    Encoded responses to filtered ``/latest`` queries (bbox, min value) and
+    to ``format=contours``, built once per snapshot and query.
+
+    A build (cutting the grid, serializing, compressing) runs in the thread
+    pool, off the event loop, and concurrent requests for the same query wait
+    on the one build in flight. Keys include the snapshot, so after a refresh
+    old entries are never hit again and the byte-bounded LRU evicts them.
+    """
+
+    def __init__(self, max_bytes: int = config.QUERY_CACHE_BYTES):
+        self._payloads = TileCache(max_bytes)
+        self._pending: Dict[Hashable, "asyncio.Future[Optional[EncodedPayload]]"] = {}
+
+    async def get(
+        self,
+        data_cache: DataCache,
+        snapshot: CacheSnapshot,
+        format: str,
+        bbox: Optional[Tuple[float, float, float, float]],
+        min_value: Optional[float],
+    ) -> Optional[EncodedPayload]:
+        key = (data_cache, snapshot.last_updated, format, bbox, min_value)
+        payload = self._payloads.get(key)
+        if payload is not None:
+            return payload
+
+        pending = self._pending.get(key)
+        if pending is None:
+            pending = asyncio.ensure_future(run_in_threadpool(data_cache.query, format, bbox, min_value, snapshot))
+            self._pending[key] = pending
+            pending.add_done_callback(lambda done: self._finish(key, done))
+        # A client that disconnects must not cancel the build others wait on
+        return await asyncio.shield(pending)
+
+    def _finish(self, key: Hashable, done: "asyncio.Future[Optional[EncodedPayload]]"):
+        del self._pending[key]
+        if not done.cancelled() and done.exception() is None and done.result() is not None:
+            self._payloads.put(key, done.result())
+
+    def clear(self):
+        self._payloads.clear()
+
+    def __len__(self) -> int:
+        return len(self._payloads)
+
+query_cache = QueryCache()
@@ -0,0 +1,83 @@
+import base64
+import numpy as np
+from typing import Dict, Any, Tuple
+from app.services.grib2_parser import RadarGrid
+from app.utils.config import config
+
+# Code reserved for "no data" wherever validity is folded into the codes
+MISSING_CODE = 255
+
+def quantize(
+    values: np.ndarray,
+    offset: float = config.QUANT_OFFSET,
+    scale: float = config.QUANT_SCALE,
+    min_value: float = config.MIN_REFLECTIVITY,
+    max_value: float = config.MAX_REFLECTIVITY,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Pack reflectivity into uint8 codes where ``value = offset + code * scale``.
+
+    Returns ``(codes, valid)``; cells outside ``min_value..max_value`` are
+    flagged invalid and get code 0.
+    """
+    valid = (values >= min_value) & (values <= max_value)
+    codes = np.rint((values - offset) / scale)
+    codes = np.where(valid, np.clip(codes, 0, MISSING_CODE - 1), 0).astype(np.uint8)
+    return codes, valid
+
+def quantize_masked(values: np.ndarray, min_value: float = config.MIN_REFLECTIVITY) -> np.ndarray:
+    """Like ``quantize`` but folds validity into the codes, marking invalid cells ``MISSING_CODE``."""
+    codes, valid = quantize(values, min_value=min_value)
+    codes[~valid] = MISSING_CODE
+    return codes
+
+def dequantize(codes: np.ndarray) -> np.ndarray:
+    """Inverse of ``quantize_masked``; missing cells become NaN."""
+    lut = config.QUANT_OFFSET + np.arange(256, dtype=np.float32) * config.QUANT_SCALE
+    lut[MISSING_CODE] = np.nan
+    return lut[codes]
+
+def encode_columnar(
+    grid: RadarGrid,
+    decimation: int = config.DECIMATION_FACTOR,
+    min_value: float = config.MIN_REFLECTIVITY,
+    max_value: float = config.MAX_REFLECTIVITY,
+    offset: float = config.QUANT_OFFSET,
+    scale: float = config.QUANT_SCALE,
+) -> Dict[str, Any]:
+    """
+    Encode the decimated grid without repeating coordinates.
+
+    Point ``(row, col)`` of the decimated grid sits at
+    ``origin + (col, row) * step``. ``mask`` is a row-major validity bitmap
+    (``np.packbits`` bit order) and ``values`` holds one quantized byte per
+    valid cell, in the same order.
+    """
+    codes, valid = quantize(grid.values[::decimation, ::decimation], offset, scale, min_value, max_value)
+    return columnar_payload(
+        codes, valid, grid.lon0, grid.lat0, grid.dlon * decimation, grid.dlat * decimation, decimation, offset, scale
+    )
+
+def columnar_payload(
+    codes: np.ndarray,
+    valid: np.ndarray,
+    lon0: float,
+    lat0: float,
+    dlon: float,
+    dlat: float,
+    decimation: int,
+    offset: float = config.QUANT_OFFSET,
+    scale: float = config.QUANT_SCALE,
+) -> Dict[str, Any]:
+    return {
+        "type": "RadarGrid",
+        "origin": [lon0, lat0],
+        "step": [dlon, dlat],
+        "decimation": decimation,
+        "shape": list(codes.shape),
+        "offset": offset,
+        "scale": scale,
+        "count": int(valid.sum()),
+        "mask": base64.b64encode(np.packbits(valid).tobytes()).decode("ascii"),
+        "values": base64.b64encode(codes[valid].tobytes()).decode("ascii"),
+    }
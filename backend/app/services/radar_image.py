@@ -0,0 +1,141 @@
+import math
+import struct
+import zlib
+import numpy as np
+from typing import Any, Dict, List, Optional
+from app.services.grib2_parser import RadarGrid
+from app.services.radar_encoding import MISSING_CODE, quantize_masked
+from app.utils.config import config
+
+# Same stops as RADAR_COLORS in frontend/src/utils/constants.ts, interpolated
+# linearly between stops like the Mapbox 'interpolate' expression that uses them
+RADAR_COLORS = [
+    (-10, (0, 50, 200, 0.2)),
+    (0, (0, 0, 255, 0.3)),
+    (5, (0, 100, 255, 0.5)),
+    (10, (0, 150, 255, 0.7)),
+    (15, (0, 200, 255, 0.8)),
+    (20, (100, 255, 255, 0.9)),
+    (25, (150, 255, 200, 0.9)),
+    (30, (200, 255, 150, 0.9)),
+    (35, (255, 255, 100, 1)),
+    (40, (255, 200, 0, 1)),
+    (45, (255, 150, 0, 1)),
+    (50, (255, 100, 0, 1)),
+    (55, (255, 50, 0, 1)),
+    (60, (255, 0, 0, 1)),
+    (65, (200, 0, 100, 1)),
+    (70, (150, 0, 150, 1)),
+]
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Web Mercator stops at the latitude where the map becomes square
+MAX_MERCATOR_LAT = 85.0511287798
+ROW_BAND = 256
+
+def build_palette() -> np.ndarray:
+    """RGBA (256, 4) uint8 color of every quantization code; ``MISSING_CODE`` is transparent."""
+    stops = np.array([stop for stop, _ in RADAR_COLORS], dtype=np.float64)
+    colors = np.array([color for _, color in RADAR_COLORS], dtype=np.float64)
+    colors[:, 3] *= 255
+    values = config.QUANT_OFFSET + np.arange(256) * config.QUANT_SCALE
+    palette = np.stack([np.interp(values, stops, colors[:, channel]) for channel in range(4)], axis=1)
+    palette = np.rint(palette).astype(np.uint8)
+    palette[MISSING_CODE] = 0
+    return palette
+
+PALETTE = build_palette()
+
+def _mercator_y(lat: float) -> float:
+    return math.log(math.tan(math.pi / 4 + math.radians(lat) / 2))
+
+def _mercator_lat(y: np.ndarray) -> np.ndarray:
+    return np.degrees(2 * np.arctan(np.exp(y)) - np.pi / 2)
+
+class ImageLayout:
+    """
+    Where each pixel of the overlay samples the grid.
+
+    Mapbox stretches an image source linearly between its corner
+    coordinates in Web Mercator, so image rows are spaced evenly in
+    Mercator y (not in latitude) and each one takes the nearest grid row.
+    Pixels are square in Mercator units, ``stride`` grid columns wide, with
+    the stride chosen to keep both sides within ``IMAGE_MAX_SIZE``.
+    ``rows`` and ``cols`` hold the sampled grid index, or -1 past the grid.
+    """
+
+    def __init__(self, grid: RadarGrid, max_size: int = config.IMAGE_MAX_SIZE):
+        n_rows, n_cols = grid.shape
+        dlon, dlat = abs(grid.dlon), abs(grid.dlat)
+        lons = (grid.lon0, grid.lon0 + (n_cols - 1) * grid.dlon)
+        lats = (grid.lat0, grid.lat0 + (n_rows - 1) * grid.dlat)
+        west = min(lons) - dlon / 2
+        north = min(max(lats) + dlat / 2, MAX_MERCATOR_LAT)
+        south = max(min(lats) - dlat / 2, -MAX_MERCATOR_LAT)
+
+        top = _mercator_y(north)
+        span = top - _mercator_y(south)
+        full_height = math.ceil(span / math.radians(dlon))
+        self.stride = max(1, math.ceil(max(n_cols, full_height) / max_size))
+        pixel = math.radians(dlon) * self.stride
+        self.width = math.ceil(n_cols / self.stride)
+        self.height = math.ceil(span / pixel)
+
+        cols = np.floor((np.arange(self.width) + 0.5) * self.stride).astype(np.int64)
+        cols[cols >= n_cols] = -1
+        if grid.dlon < 0:
+            cols = np.where(cols >= 0, n_cols - 1 - cols, -1)
+
+        pixel_lats = _mercator_lat(top - (np.arange(self.height) + 0.5) * pixel)
+        rows = np.floor((max(lats) + dlat / 2 - pixel_lats) / dlat).astype(np.int64)
+        rows[(rows < 0) | (rows >= n_rows)] = -1
+        if grid.dlat > 0:
+            rows = np.where(rows >= 0, n_rows - 1 - rows, -1)
+        self.rows = rows
+        self.cols = cols
+
+        east = west + self.width * math.degrees(pixel)
+        bottom = float(_mercator_lat(np.array(top - self.height * pixel)))
+        if west > 180:
+            west, east = west - 360, east - 360
+        self.coordinates: List[List[float]] = [[west, north], [east, north], [east, bottom], [west, bottom]]
+
+    def metadata(self) -> Dict[str, Any]:
+        return {"width": self.width, "height": self.height, "coordinates": self.coordinates}
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+def render_png(grid: RadarGrid, layout: Optional[ImageLayout] = None) -> bytes:
+    """
+    Render the grid as an indexed-color PNG for a Mapbox ``image`` source.
+
+    Pixels are quantization codes (see ``quantize_masked``) and the PNG
+    palette plus ``tRNS`` alpha is ``PALETTE``, so the color lookup is a
+    table the decoder applies: one byte per pixel instead of four. Rows are
+    sampled, quantized and deflated in bands to bound memory.
+    """
+    layout = layout or ImageLayout(grid)
+    header = struct.pack(">IIBBBBB", layout.width, layout.height, 8, 3, 0, 0, 0)
+    compressor = zlib.compressobj(6)
+    cols = np.maximum(layout.cols, 0)
+    parts = []
+    for start in range(0, layout.height, ROW_BAND):
+        rows = layout.rows[start:start + ROW_BAND]
+        codes = quantize_masked(grid.values[np.maximum(rows, 0)][:, cols])
+        codes[rows < 0] = MISSING_CODE
+        codes[:, layout.cols < 0] = MISSING_CODE
+        # Each PNG scanline starts with its filter type, 0 (none)
+        scanlines = np.zeros((len(rows), layout.width + 1), dtype=np.uint8)
+        scanlines[:, 1:] = codes
+        parts.append(compressor.compress(scanlines.tobytes()))
+    parts.append(compressor.flush())
+
+    return b"".join([
+        PNG_SIGNATURE,
+        _chunk(b"IHDR", header),
+        _chunk(b"PLTE", PALETTE[:, :3].tobytes()),
+        _chunk(b"tRNS", PALETTE[:, 3].tobytes()),
+        _chunk(b"IDAT", b"".join(parts)),
+        _chunk(b"IEND", b""),
+    ])
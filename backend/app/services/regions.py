@@ -0,0 +1,50 @@
+from typing import Any, Dict, Optional, Tuple
+from app.utils.config import config
+
+BBox = Tuple[float, float, float, float]
+
+class Region:
+    """A region of interest from ``config.REGIONS``: a named lat/lon box."""
+
+    __slots__ = ("name", "bbox")
+
+    def __init__(self, name: str, bbox: BBox):
+        min_lon, min_lat, max_lon, max_lat = bbox
+        if min_lon >= max_lon or min_lat >= max_lat:
+            raise ValueError(f"Region {name}: bbox must be (min_lon, min_lat, max_lon, max_lat)")
+        self.name = name
+        self.bbox = (min_lon, min_lat, max_lon, max_lat)
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "bbox": list(self.bbox),
+            "url": f"/api/radar/latest?region={self.name}",
+        }
+
+def _load_regions() -> Dict[str, Region]:
+    unknown = set(config.ENABLED_REGIONS) - set(config.REGIONS)
+    if unknown:
+        raise ValueError(f"Unknown radar regions: {', '.join(sorted(unknown))}")
+    return {name: Region(name, config.REGIONS[name]) for name in config.ENABLED_REGIONS}
+
+def _crop_bounds(regions: Dict[str, Region]) -> Optional[BBox]:
+    """
+    The smallest box holding every region, or None to keep the whole grid.
+
+    One box rather than one crop per region: the default product's grid
+    backs frames, the image and tiles, which need a single grid. Far-apart
+    regions therefore keep most of the field between them.
+    """
+    if not regions:
+        return None
+    boxes = [region.bbox for region in regions.values()]
+    return (
+        min(box[0] for box in boxes),
+        min(box[1] for box in boxes),
+        max(box[2] for box in boxes),
+        max(box[3] for box in boxes),
+    )
+
+regions = _load_regions()
+crop_bounds = _crop_bounds(regions)
@@ -1,38 +1,279 @@
 import asyncio
+import os
+import time
 from datetime import datetime
-from app.services.mrms_fetcher import fetch_latest_rala_file
-from app.services.grib2_parser import parse_grib2_to_geojson
-from app.services.data_cache import cache
+from typing import Optional
+from app.services.mrms_fetcher import (
+    fetch_latest_file,
+    fetch_latest_rala_file,
+    remember_source,
+    list_recent_files,
+    download_grib2,
+    SourceFingerprint,
+)
+from app.services import metrics, shared_cache, snapshot_store
+from app.services.broadcaster import announce_update
+from app.services.cadence import cadence
+from app.services.frame_delta import delta_cache
+from app.services.frame_history import RadarFrame, frame_history
+from app.services.grib2_parser import RadarGrid, grid_to_geojson
+from app.services.parse_worker import parse_worker
+from app.services.radar_encoding import encode_columnar
+from app.services.radar_image import render_png
+from app.services.data_cache import cache, product_caches, region_caches
+from app.services.products import RadarProduct, default_product, products
+from app.services.regions import Region, regions
+from app.services.startup import startup_timer
 from app.utils.config import config
 
 _scheduler_task = None
+_backfill_task = None
+# One lock per product: a product's refreshes never overlap
+_refresh_locks = {name: asyncio.Lock() for name in products}
 
-async def update_radar_data():
+def publish_grid(grid: RadarGrid, timestamp: datetime, last_updated: Optional[datetime] = None):
+    """
+    Extract, serialize and publish a decoded grid to the cache, as refreshed
+    at ``last_updated`` (default: now).
+
+    Contours are not built here: ``format=contours`` is traced on first
+    request per update (see ``query_cache``), so neither a refresh nor a
+    snapshot restore waits on it.
+    """
+    with metrics.timed("extract", config.DEFAULT_PRODUCT):
+        geo_json = grid_to_geojson(grid)
+        columnar = encode_columnar(grid)
+    metrics.FEATURES.set(len(geo_json["features"]))
+    with metrics.timed("image", config.DEFAULT_PRODUCT):
+        image = render_png(grid)
+    cache.set(geo_json, timestamp, columnar=columnar, grid=grid, image=image, last_updated=last_updated)
+    if regions:
+        with metrics.timed("regions", config.DEFAULT_PRODUCT):
+            for region in regions.values():
+                publish_region(region, grid, timestamp, cache.last_updated)
+    with metrics.timed("frame", config.DEFAULT_PRODUCT):
+        frame_history.add(RadarFrame.from_grid(grid, timestamp))
+    with metrics.timed("delta", config.DEFAULT_PRODUCT):
+        delta_cache.update(cache.snapshot)
+
+def publish_region(region: Region, grid: RadarGrid, timestamp: datetime, last_updated: Optional[datetime] = None):
+    """Cache the points of one region of interest, cut from the decoded grid."""
+    window = grid.crop(*grid.window(*region.bbox, stride=default_product.decimation))
+    region_caches[region.name].set(
+        default_product.geojson(window),
+        timestamp,
+        columnar=default_product.columnar(window),
+        grid=window,
+        last_updated=last_updated,
+    )
+
+def mark_ready(phase: str):
+    """Record startup ``phase`` and, the first time the cache holds data, how long serving took."""
+    startup_timer.mark(phase)
+    if "ready" in startup_timer or not cache.is_valid():
+        return
+    seconds = startup_timer.mark("ready")
+    phases = ", ".join(f"{name} {value:.2f}s" for name, value in startup_timer.phases().items())
+    print(f"Serving radar data {seconds:.2f}s after process start ({phases})")
+    if seconds > config.STARTUP_TARGET:
+        print(f"Warning: startup took longer than STARTUP_TARGET ({config.STARTUP_TARGET:.0f}s)")
+
+def persist_snapshot(grid: RadarGrid, timestamp: datetime, fingerprint: SourceFingerprint):
+    try:
+        snapshot_store.save_grid(grid, timestamp, source=fingerprint.to_dict(), last_updated=cache.last_updated)
+        frame = frame_history.get(timestamp)
+        if frame is not None:
+            snapshot_store.save_frame(frame)
+        snapshot_store.prune_frames()
+    except Exception as error:
+        print(f"Failed to write radar snapshot: {error}")
+
+def publish_shared():
+    try:
+        shared_cache.publish()
+    except Exception as error:
+        print(f"Failed to publish radar data to other workers: {error}")
+
+async def restore_snapshot():
+    """Serve the last persisted grid and frames while the first refresh runs."""
+    frames = await asyncio.to_thread(snapshot_store.load_frames)
+    snapshot = await asyncio.to_thread(snapshot_store.load_grid)
+    if snapshot is None:
+        return
+    grid, timestamp, source, last_updated = snapshot
+    if timestamp != cache.data_timestamp:
+        # Keep the original refresh time: hours-old data must not look fresh
+        await asyncio.to_thread(publish_grid, grid, timestamp, last_updated)
+        announce_update()
+        mark_ready("snapshot_restored")
+    cadence.seed([timestamp] + [frame.timestamp for frame in frame_history.frames()])
+    if source:
+        remember_source(SourceFingerprint(**source))
+    print(f"Restored radar snapshot from {timestamp.isoformat()} ({frames} frames)")
+
+async def update_radar_data() -> str:
+    """One refresh; returns ``"updated"``, ``"unchanged"`` or ``"error"``. Refreshes never overlap."""
+    async with _refresh_locks[config.DEFAULT_PRODUCT]:
+        return await _refresh()
+
+async def _refresh() -> str:
+    start = time.perf_counter()
     try:
         print("Fetching latest radar data...")
-        buffer, timestamp = fetch_latest_rala_file()
-        geo_json = parse_grib2_to_geojson(buffer)
-        cache.set(geo_json, timestamp)
+        result = await fetch_latest_rala_file()
+        if result is None:
+            metrics.UPDATES.inc(product=config.DEFAULT_PRODUCT, result="unchanged")
+            return "unchanged"
+        buffer, timestamp, fingerprint = result
+        cadence.observe(timestamp)
+        with metrics.timed("decode", config.DEFAULT_PRODUCT):
+            grid = await parse_worker.decode(buffer)
+        del buffer
+        # Extraction and serialization still cost CPU; keep them off the event loop
+        await asyncio.to_thread(publish_grid, grid, timestamp)
+        announce_update()
+        remember_source(fingerprint)
+        with metrics.timed("snapshot", config.DEFAULT_PRODUCT):
+            await asyncio.to_thread(persist_snapshot, grid, timestamp, fingerprint)
+        if config.SHARED_CACHE:
+            await asyncio.to_thread(publish_shared)
+        metrics.UPDATES.inc(product=config.DEFAULT_PRODUCT, result="updated")
+        metrics.observe_stage("total", time.perf_counter() - start, config.DEFAULT_PRODUCT)
         print(f"Radar data updated at {datetime.now().isoformat()}")
+        return "updated"
     except Exception as error:
+        metrics.UPDATES.inc(product=config.DEFAULT_PRODUCT, result="error")
         print(f"Failed to update radar data: {error}")
+        return "error"
+
+def publish_product(product: RadarProduct, grid: RadarGrid, timestamp: datetime):
+    """Extract, serialize and publish a decoded grid of a non-default product to its cache slot."""
+    with metrics.timed("extract", product.name):
+        geo_json = product.geojson(grid)
+        columnar = product.columnar(grid)
+    product_caches[product.name].set(geo_json, timestamp, columnar=columnar, grid=grid)
+
+async def update_product(product: RadarProduct) -> str:
+    """Refresh one non-default product; same outcomes as ``update_radar_data``."""
+    async with _refresh_locks[product.name]:
+        start = time.perf_counter()
+        try:
+            result = await fetch_latest_file(product.path, product.name)
+            if result is None:
+                metrics.UPDATES.inc(product=product.name, result="unchanged")
+                return "unchanged"
+            buffer, timestamp, fingerprint = result
+            with metrics.timed("decode", product.name):
+                grid = await parse_worker.decode(buffer)
+            del buffer
+            await asyncio.to_thread(publish_product, product, grid, timestamp)
+            remember_source(fingerprint, product.path)
+            metrics.UPDATES.inc(product=product.name, result="updated")
+            metrics.observe_stage("total", time.perf_counter() - start, product.name)
+            print(f"Product {product.name} updated to {timestamp.isoformat()}")
+            return "updated"
+        except Exception as error:
+            metrics.UPDATES.inc(product=product.name, result="error")
+            print(f"Failed to update product {product.name}: {error}")
+            return "error"
+
+async def refresh_products() -> str:
+    """
+    Refresh every enabled product, at most ``PRODUCT_CONCURRENCY`` at a time.
+
+    Products share the HTTP connection pool and the parse worker. Returns
+    the default product's outcome, which drives the poll cadence.
+    """
+    semaphore = asyncio.Semaphore(config.PRODUCT_CONCURRENCY)
+
+    async def bounded(refresh):
+        async with semaphore:
+            return await refresh
+
+    refreshes = [update_radar_data()] + [update_product(product) for product in products.values() if not product.is_default]
+    outcomes = await asyncio.gather(*(bounded(refresh) for refresh in refreshes))
+    if "updated" in outcomes[1:]:
+        # The default product publishes and announces itself; do it for the others
+        if config.SHARED_CACHE:
+            await asyncio.to_thread(publish_shared)
+        announce_update()
+    return outcomes[0]
+
+async def backfill_frame_history():
+    """Load older scans listed in the MRMS directory into the frame history."""
+    try:
+        files = await list_recent_files(config.FRAME_HISTORY_SIZE)
+    except Exception as error:
+        print(f"Skipping frame backfill, could not list MRMS files: {error}")
+        return
+    cadence.seed(timestamp for _, timestamp in files)
+
+    missing = [(url, timestamp) for url, timestamp in files if timestamp not in frame_history]
+    semaphore = asyncio.Semaphore(config.BACKFILL_CONCURRENCY)
+
+    async def load_frame(url, timestamp):
+        async with semaphore:
+            try:
+                buffer, _ = await download_grib2(url)
+                grid = await parse_worker.decode(buffer)
+                del buffer
+                frame = await asyncio.to_thread(RadarFrame.from_grid, grid, timestamp)
+                frame_history.add(frame)
+                await asyncio.to_thread(snapshot_store.save_frame, frame)
+            except Exception as error:
+                print(f"Failed to backfill frame {timestamp.isoformat()}: {error}")
+
+    await asyncio.gather(*(load_frame(url, timestamp) for url, timestamp in missing))
+    await asyncio.to_thread(snapshot_store.prune_frames)
+    if config.SHARED_CACHE and cache.is_valid():
+        await asyncio.to_thread(publish_shared)
+    print(f"Frame history holds {len(frame_history)} frames")
 
 async def scheduler_loop():
-    await update_radar_data()
-    
+    global _backfill_task
+    await restore_snapshot()
+    outcome = await refresh_products()
+    mark_ready("first_refresh")
+    _backfill_task = asyncio.create_task(backfill_frame_history())
+
     while True:
-        await asyncio.sleep(config.UPDATE_INTERVAL)
-        await update_radar_data()
+        # Waits are measured from the end of a refresh toward the next
+        # expected scan, so fetch and parse time do not accumulate as drift
+        delay = cadence.next_delay(outcome)
+        metrics.NEXT_POLL.set(delay)
+        await asyncio.sleep(delay)
+        outcome = await refresh_products()
+
+async def follower_loop():
+    """
+    Serve what the elected worker publishes, and become the fetcher if the
+    leader lock frees up (the leader exited or was restarted).
+    """
+    seen = None
+    while not shared_cache.leader_lock.try_acquire():
+        current = shared_cache.generation.value
+        if current != seen and await asyncio.to_thread(shared_cache.load_published):
+            seen = current
+            announce_update()
+            mark_ready("shared_loaded")
+        await asyncio.sleep(config.SHARED_POLL_INTERVAL)
+
+    print(f"Worker {os.getpid()} elected as radar fetcher")
+    await scheduler_loop()
 
 async def start_scheduler():
     global _scheduler_task
     if _scheduler_task is None or (_scheduler_task and _scheduler_task.done()):
-        _scheduler_task = asyncio.create_task(scheduler_loop())
-        print(f"Scheduler started with {config.UPDATE_INTERVAL}s interval")
+        loop = follower_loop() if config.SHARED_CACHE else scheduler_loop()
+        _scheduler_task = asyncio.create_task(loop)
+        print(f"Scheduler started, polling at most every {config.UPDATE_INTERVAL}s")
 
 def stop_scheduler():
-    global _scheduler_task
+    global _scheduler_task, _backfill_task
     if _scheduler_task and not _scheduler_task.done():
         _scheduler_task.cancel()
         _scheduler_task = None
-
+    if _backfill_task and not _backfill_task.done():
+        _backfill_task.cancel()
+        _backfill_task = None
+    shared_cache.leader_lock.release()
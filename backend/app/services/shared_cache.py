@@ -0,0 +1,207 @@
+import fcntl
+import mmap
+import os
+import struct
+import numpy as np
+from datetime import datetime
+from typing import Any, Dict, Optional, Tuple
+from app.services import snapshot_store
+from app.services.data_cache import cache, product_caches, region_caches, DataCache, EncodedPayload
+from app.services.grib2_parser import RadarGrid
+from app.services.products import default_product
+from app.services.regions import regions
+from app.utils.config import config
+
+# Sharing between server workers, built on the snapshot store: the elected
+# worker writes the grid, frames and encoded payloads to SNAPSHOT_DIR and then
+# bumps a generation counter; the other workers watch the counter and
+# memory-map the new files, so every process serves the same page-cache copy.
+LOCK_FILE = "leader.lock"
+GENERATION_FILE = "generation"
+PAYLOADS = "payloads.radar"
+GENERATION = struct.Struct("<Q")
+
+class LeaderLock:
+    """
+    Non-blocking exclusive ``flock`` on a file in ``SNAPSHOT_DIR``.
+
+    The kernel drops the lock when the holder exits, however it exits, so a
+    follower polling ``try_acquire`` takes over from a dead leader.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd: Optional[int] = None
+
+    @property
+    def held(self) -> bool:
+        return self._fd is not None
+
+    def try_acquire(self) -> bool:
+        if self._fd is not None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        self._fd = fd
+        return True
+
+    def release(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+class GenerationCounter:
+    """A u64 in a small memory-mapped file; reading it costs no system call."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._map: Optional[mmap.mmap] = None
+
+    def _mapped(self) -> mmap.mmap:
+        if self._map is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                if os.fstat(fd).st_size < GENERATION.size:
+                    os.ftruncate(fd, GENERATION.size)
+                self._map = mmap.mmap(fd, GENERATION.size)
+            finally:
+                os.close(fd)
+        return self._map
+
+    @property
+    def value(self) -> int:
+        return GENERATION.unpack_from(self._mapped())[0]
+
+    def set(self, value: int):
+        GENERATION.pack_into(self._mapped(), 0, value)
+
+def _path(name: str) -> str:
+    return os.path.join(config.SNAPSHOT_DIR, name)
+
+leader_lock = LeaderLock(_path(LOCK_FILE))
+generation = GenerationCounter(_path(GENERATION_FILE))
+
+def _payload_file(product: str) -> str:
+    return PAYLOADS if product == config.DEFAULT_PRODUCT else f"payloads-{product}.radar"
+
+def _region_file(region: str) -> str:
+    return f"payloads-region-{region}.radar"
+
+def _published_caches() -> Dict[str, DataCache]:
+    """Every cache slot by the file its payloads are published to."""
+    files = {_payload_file(product): data_cache for product, data_cache in product_caches.items()}
+    files.update({_region_file(region): data_cache for region, data_cache in region_caches.items()})
+    return files
+
+def _write_payloads(path: str, data_cache: DataCache, next_generation: int):
+    snapshot = data_cache.snapshot
+    parts = []
+    formats = {}
+    offset = 0
+    for format, payload in snapshot.payloads.items():
+        entry = {"etag": payload.etag}
+        for name in ("body", "gzip", "brotli"):
+            data = getattr(payload, name)
+            if data is None:
+                entry[name] = None
+                continue
+            entry[name] = [offset, len(data)]
+            parts.append(data)
+            offset += len(data)
+        formats[format] = entry
+
+    meta = {
+        "generation": next_generation,
+        "lastUpdated": snapshot.last_updated.isoformat(),
+        "dataTimestamp": snapshot.data_timestamp.isoformat(),
+        "formats": formats,
+    }
+    snapshot_store.write_snapshot(path, np.frombuffer(b"".join(parts), dtype=np.uint8), meta)
+
+def _read_payloads(path: str) -> Tuple[Dict[str, EncodedPayload], Dict[str, Any]]:
+    array, meta = snapshot_store.read_snapshot(path)
+
+    def view(span) -> Optional[memoryview]:
+        return None if span is None else memoryview(array[span[0]:span[0] + span[1]])
+
+    payloads = {
+        format: EncodedPayload.from_encoded(view(entry["body"]), view(entry["gzip"]), view(entry["brotli"]), entry["etag"])
+        for format, entry in meta["formats"].items()
+    }
+    return payloads, meta
+
+def publish():
+    """
+    Make the cache contents visible to the other workers (leader only).
+
+    Call after the grid and frames have been saved to the snapshot store. The
+    encoded payloads of each product go into one snapshot whose array is the
+    concatenation of every body, so followers never re-serialize or
+    re-compress anything.
+    """
+    next_generation = generation.value + 1
+    for name, data_cache in _published_caches().items():
+        if data_cache.is_valid():
+            _write_payloads(_path(name), data_cache, next_generation)
+    generation.set(next_generation)
+
+def load_published() -> bool:
+    """
+    Point this worker's caches at the leader's latest publication (followers only).
+
+    Returns False if the files are missing or were replaced mid-read; the
+    caller retries on its next poll. Regions get their window of the shared
+    grid; other products are served from their payloads alone, without a
+    grid, so bbox queries on them need the leader.
+    """
+    try:
+        payloads, meta = _read_payloads(_path(PAYLOADS))
+        data_timestamp = datetime.fromisoformat(meta["dataTimestamp"])
+    except FileNotFoundError:
+        return False
+    except (snapshot_store.SnapshotError, OSError, KeyError, ValueError) as error:
+        print(f"Ignoring shared radar payloads: {error}")
+        return False
+
+    if data_timestamp != cache.data_timestamp:
+        # The leader may serve a grid older than SNAPSHOT_MAX_AGE; so must we
+        snapshot = snapshot_store.load_grid(max_age=None)
+        if snapshot is None or snapshot[1] != data_timestamp:
+            return False
+        cache.set_encoded(payloads, snapshot[0], datetime.fromisoformat(meta["lastUpdated"]), data_timestamp)
+
+    for product, data_cache in product_caches.items():
+        if data_cache is not cache:
+            _load_secondary(_payload_file(product), data_cache)
+    for region, data_cache in region_caches.items():
+        grid = cache.grid
+        if grid is not None:
+            grid = grid.crop(*grid.window(*regions[region].bbox, stride=default_product.decimation))
+        _load_secondary(_region_file(region), data_cache, grid)
+
+    snapshot_store.load_frames()
+    return True
+
+def _load_secondary(name: str, data_cache: DataCache, grid: Optional[RadarGrid] = None):
+    """Serve one more published cache slot, with ``grid`` for queries if there is one."""
+    try:
+        payloads, meta = _read_payloads(_path(name))
+        data_timestamp = datetime.fromisoformat(meta["dataTimestamp"])
+    except FileNotFoundError:
+        return
+    except (snapshot_store.SnapshotError, OSError, KeyError, ValueError) as error:
+        print(f"Ignoring shared payloads {name}: {error}")
+        return
+    if data_timestamp != data_cache.data_timestamp:
+        data_cache.set_encoded(
+            payloads,
+            grid,
+            datetime.fromisoformat(meta["lastUpdated"]),
+            data_timestamp,
+        )
@@ -0,0 +1,191 @@
+import json
+import os
+import struct
+import zlib
+import numpy as np
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+from app.services.frame_history import RadarFrame, frame_history, parse_frame_id
+from app.services.grib2_parser import RadarGrid
+from app.utils.config import config
+
+# File layout: MAGIC, u16 format version, u32 header length, JSON header,
+# zero padding up to DATA_ALIGNMENT, then the raw C-order array bytes.
+MAGIC = b"RDRSNAP\x00"
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct("<8sHI")
+DATA_ALIGNMENT = 64
+
+LATEST_GRID = "latest.radar"
+FRAME_PREFIX = "frame-"
+
+class SnapshotError(ValueError):
+    pass
+
+def write_snapshot(path: str, array: np.ndarray, meta: Dict[str, Any]):
+    """Write ``array`` plus ``meta`` atomically: readers see the old file or the new one, never a partial one."""
+    array = np.ascontiguousarray(array)
+    header = {
+        "dtype": array.dtype.str,
+        "shape": list(array.shape),
+        "crc32": zlib.crc32(array),
+        "meta": meta,
+    }
+    header_bytes = json.dumps(header, separators=(",", ":")).encode("utf-8")
+    data_offset = PREAMBLE.size + len(header_bytes)
+    padding = -data_offset % DATA_ALIGNMENT
+
+    tmp_path = f"{path}.tmp-{os.getpid()}"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+            f.write(header_bytes)
+            f.write(b"\x00" * padding)
+            f.write(memoryview(array).cast("B"))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+
+def read_snapshot(path: str) -> Tuple[np.ndarray, Dict[str, Any]]:
+    """Memory-map a snapshot written by ``write_snapshot``; raises ``SnapshotError`` if it is unusable."""
+    with open(path, "rb") as f:
+        preamble = f.read(PREAMBLE.size)
+        if len(preamble) != PREAMBLE.size:
+            raise SnapshotError(f"{path}: truncated preamble")
+        magic, version, header_length = PREAMBLE.unpack(preamble)
+        if magic != MAGIC:
+            raise SnapshotError(f"{path}: not a radar snapshot")
+        if version != FORMAT_VERSION:
+            raise SnapshotError(f"{path}: format version {version}, expected {FORMAT_VERSION}")
+        try:
+            header = json.loads(f.read(header_length))
+        except ValueError as error:
+            raise SnapshotError(f"{path}: corrupt header ({error})")
+
+    data_offset = PREAMBLE.size + header_length
+    data_offset += -data_offset % DATA_ALIGNMENT
+    dtype = np.dtype(header["dtype"])
+    shape = tuple(header["shape"])
+    expected_size = data_offset + dtype.itemsize * int(np.prod(shape))
+    if os.path.getsize(path) != expected_size:
+        raise SnapshotError(f"{path}: size mismatch, expected {expected_size} bytes")
+
+    array = np.memmap(path, dtype=dtype, mode="r", offset=data_offset, shape=shape)
+    if zlib.crc32(array) != header["crc32"]:
+        raise SnapshotError(f"{path}: checksum mismatch")
+    return array, header["meta"]
+
+def _is_stale(timestamp: datetime, max_age: float = config.SNAPSHOT_MAX_AGE) -> bool:
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    age = datetime.now(timezone.utc) - timestamp
+    return age.total_seconds() > max_age
+
+def _grid_meta(grid: RadarGrid, timestamp: datetime) -> Dict[str, Any]:
+    return {
+        "dataTimestamp": timestamp.isoformat(),
+        "lat0": grid.lat0,
+        "lon0": grid.lon0,
+        "dlat": grid.dlat,
+        "dlon": grid.dlon,
+    }
+
+def save_grid(
+    grid: RadarGrid,
+    timestamp: datetime,
+    source: Optional[Dict[str, Any]] = None,
+    last_updated: Optional[datetime] = None,
+):
+    os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+    meta = _grid_meta(grid, timestamp)
+    meta["source"] = source
+    meta["lastUpdated"] = last_updated.isoformat() if last_updated else None
+    write_snapshot(os.path.join(config.SNAPSHOT_DIR, LATEST_GRID), grid.values, meta)
+
+def save_frame(frame: RadarFrame):
+    os.makedirs(config.SNAPSHOT_DIR, exist_ok=True)
+    meta = {
+        "dataTimestamp": frame.timestamp.isoformat(),
+        "lat0": frame.lat0,
+        "lon0": frame.lon0,
+        "dlat": frame.dlat,
+        "dlon": frame.dlon,
+        "decimation": frame.decimation,
+    }
+    write_snapshot(os.path.join(config.SNAPSHOT_DIR, f"{FRAME_PREFIX}{frame.id}.radar"), frame.codes, meta)
+
+def prune_frames():
+    """Delete frame snapshots that have been evicted from the in-memory history."""
+    retained = {f"{FRAME_PREFIX}{frame.id}.radar" for frame in frame_history.frames()}
+    try:
+        names = os.listdir(config.SNAPSHOT_DIR)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.startswith(FRAME_PREFIX) and name not in retained:
+            try:
+                os.unlink(os.path.join(config.SNAPSHOT_DIR, name))
+            except FileNotFoundError:
+                pass
+
+def load_grid(
+    max_age: Optional[float] = config.SNAPSHOT_MAX_AGE,
+) -> Optional[Tuple[RadarGrid, datetime, Optional[Dict[str, Any]], datetime]]:
+    """
+    Return ``(grid, timestamp, source, last_updated)`` from the latest
+    snapshot, or None if missing, stale or corrupt. ``last_updated`` is when
+    the grid was cached; snapshots written without it fall back to the data
+    timestamp.
+    """
+    path = os.path.join(config.SNAPSHOT_DIR, LATEST_GRID)
+    if not os.path.exists(path):
+        return None
+    try:
+        values, meta = read_snapshot(path)
+        timestamp = datetime.fromisoformat(meta["dataTimestamp"])
+        if meta.get("lastUpdated"):
+            last_updated = datetime.fromisoformat(meta["lastUpdated"])
+        else:
+            # Cache times are naive local time (see DataCache.set)
+            last_updated = timestamp.astimezone().replace(tzinfo=None) if timestamp.tzinfo else timestamp
+    except (SnapshotError, OSError, KeyError, ValueError) as error:
+        print(f"Ignoring radar snapshot: {error}")
+        return None
+    if max_age is not None and _is_stale(timestamp, max_age):
+        print(f"Ignoring stale radar snapshot from {timestamp.isoformat()}")
+        return None
+
+    grid = RadarGrid(values, lat0=meta["lat0"], lon0=meta["lon0"], dlat=meta["dlat"], dlon=meta["dlon"])
+    return grid, timestamp, meta.get("source"), last_updated
+
+def load_frames() -> int:
+    """Restore frame snapshots missing from the frame history; returns how many were loaded."""
+    try:
+        names = sorted(os.listdir(config.SNAPSHOT_DIR))
+    except FileNotFoundError:
+        return 0
+
+    loaded = 0
+    for name in names:
+        if not (name.startswith(FRAME_PREFIX) and name.endswith(".radar")):
+            continue
+        if parse_frame_id(name[len(FRAME_PREFIX):-len(".radar")]) in frame_history:
+            continue
+        try:
+            codes, meta = read_snapshot(os.path.join(config.SNAPSHOT_DIR, name))
+            timestamp = datetime.fromisoformat(meta["dataTimestamp"])
+            if _is_stale(timestamp):
+                continue
+            frame_history.add(RadarFrame(
+                timestamp, codes, meta["lat0"], meta["lon0"], meta["dlat"], meta["dlon"], meta["decimation"]
+            ))
+            loaded += 1
+        except (SnapshotError, OSError, KeyError, ValueError) as error:
+            print(f"Ignoring frame snapshot {name}: {error}")
+    return loaded
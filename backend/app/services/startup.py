@@ -0,0 +1,41 @@
+import os
+import time
+from typing import Dict, Optional
+
+def _process_age() -> Optional[float]:
+    """Seconds since this process started (Linux ``/proc``), or None elsewhere."""
+    try:
+        with open("/proc/self/stat") as stat:
+            # Field 22, counted after the parenthesized command name
+            start_ticks = int(stat.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as uptime:
+            return float(uptime.read().split()[0]) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError):
+        return None
+
+class StartupTimer:
+    """
+    Seconds from process start to each startup phase, recorded once.
+
+    The clock starts when the process did where ``/proc`` says so, else when
+    this module was imported; ``interpreter`` is the time spent before that
+    (Python itself, the server and whatever imported us).
+    """
+
+    def __init__(self):
+        age = _process_age()
+        self._origin = time.perf_counter() - (age or 0.0)
+        self._phases: Dict[str, float] = {}
+        if age is not None:
+            self._phases["interpreter"] = age
+
+    def mark(self, phase: str) -> float:
+        return self._phases.setdefault(phase, time.perf_counter() - self._origin)
+
+    def phases(self) -> Dict[str, float]:
+        return {phase: round(seconds, 3) for phase, seconds in self._phases.items()}
+
+    def __contains__(self, phase: str) -> bool:
+        return phase in self._phases
+
+startup_timer = StartupTimer()
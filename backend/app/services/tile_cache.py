@@ -0,0 +1,41 @@
+from collections import OrderedDict
+from typing import Hashable, Optional
+from app.services.data_cache import EncodedPayload
+from app.utils.config import config
+
+class TileCache:
+    """LRU of encoded tiles bounded by total bytes rather than entry count."""
+
+    def __init__(self, max_bytes: int = config.TILE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: "OrderedDict[Hashable, EncodedPayload]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[EncodedPayload]:
+        payload = self._entries.get(key)
+        if payload is not None:
+            self._entries.move_to_end(key)
+        return payload
+
+    def put(self, key: Hashable, payload: EncodedPayload):
+        if key in self._entries:
+            self.size -= self._payload_size(self._entries.pop(key))
+        self._entries[key] = payload
+        self.size += self._payload_size(payload)
+
+        while self.size > self.max_bytes and len(self._entries) > 1:
+            _, evicted = self._entries.popitem(last=False)
+            self.size -= self._payload_size(evicted)
+
+    def clear(self):
+        self._entries.clear()
+        self.size = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _payload_size(payload: EncodedPayload) -> int:
+        return len(payload.body) + len(payload.gzip) + len(payload.brotli or b"")
+
+tile_cache = TileCache()
@@ -0,0 +1,126 @@
+import math
+import struct
+import numpy as np
+from typing import Tuple
+from app.services.grib2_parser import RadarGrid
+from app.services.radar_encoding import quantize
+from app.utils.config import config
+
+LAYER_NAME = "radar"
+# Fraction of the tile width included past each edge so circles drawn near
+# a tile boundary are not clipped by the neighbouring tile.
+TILE_BUFFER = 1 / 16
+
+def tile_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    """Return ``(min_lon, min_lat, max_lon, max_lat)`` of a Web Mercator tile."""
+    n = 2 ** z
+
+    def lat(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360 - 180, lat(y + 1), (x + 1) / n * 360 - 180, lat(y)
+
+def tile_decimation(grid: RadarGrid, z: int) -> int:
+    """Pick the grid stride that yields about ``TILE_SAMPLES`` points across a tile at zoom ``z``."""
+    tile_degrees = 360 / 2 ** z
+    return max(1, int(tile_degrees / config.TILE_SAMPLES / abs(grid.dlon)))
+
+def _mercator_y(lat: np.ndarray) -> np.ndarray:
+    return np.log(np.tan(np.pi / 4 + np.radians(lat) / 2))
+
+def _tag(field: int, wire_type: int) -> bytes:
+    return _varint((field << 3) | wire_type)
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+def _varints(values: np.ndarray) -> bytes:
+    """Encode a uint32 array as concatenated protobuf varints without a Python loop."""
+    values = values.astype(np.uint64)
+    width = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28):
+        width += values >= (1 << shift)
+
+    groups = np.empty((len(values), 5), dtype=np.uint8)
+    for k in range(5):
+        more = (k < width - 1).astype(np.uint8) << 7
+        groups[:, k] = ((values >> np.uint64(7 * k)) & np.uint64(0x7F)).astype(np.uint8) | more
+    return groups[np.arange(5) < width[:, None]].tobytes()
+
+def _zigzag(values: np.ndarray) -> np.ndarray:
+    values = values.astype(np.int64)
+    return ((values << 1) ^ (values >> 63)).astype(np.uint64)
+
+def _message(field: int, payload: bytes) -> bytes:
+    return _tag(field, 2) + _varint(len(payload)) + payload
+
+def render_tile(grid: RadarGrid, z: int, x: int, y: int) -> bytes:
+    """
+    Encode the radar points inside tile ``z/x/y`` as a Mapbox Vector Tile.
+
+    Points are grouped into one MultiPoint feature per quantized reflectivity
+    so the property table stays tiny. An empty tile encodes to ``b""``.
+    """
+    min_lon, min_lat, max_lon, max_lat = tile_bounds(z, x, y)
+    pad_lon = (max_lon - min_lon) * TILE_BUFFER
+    pad_lat = (max_lat - min_lat) * TILE_BUFFER
+    stride = tile_decimation(grid, z)
+
+    row_window, col_window = grid.window(min_lon - pad_lon, min_lat - pad_lat, max_lon + pad_lon, max_lat + pad_lat, stride)
+    rows = np.arange(row_window.start, row_window.stop, stride)
+    cols = np.arange(col_window.start, col_window.stop, stride)
+    if not len(rows) or not len(cols):
+        return b""
+
+    codes, valid = quantize(grid.values[np.ix_(rows, cols)])
+    row_idx, col_idx = np.nonzero(valid)
+    if not len(row_idx):
+        return b""
+
+    extent = config.TILE_EXTENT
+    lats = grid.lat0 + rows * grid.dlat
+    lons = grid.lon0 + cols * grid.dlon
+    top, bottom = _mercator_y(np.array([max_lat, min_lat]))
+    px = np.rint((lons - min_lon) / (max_lon - min_lon) * extent).astype(np.int64)
+    py = np.rint((top - _mercator_y(lats)) / (top - bottom) * extent).astype(np.int64)
+
+    point_codes = codes[row_idx, col_idx]
+    order = np.argsort(point_codes, kind="stable")
+    point_codes = point_codes[order]
+    xs = px[col_idx[order]]
+    ys = py[row_idx[order]]
+    unique_codes, starts = np.unique(point_codes, return_index=True)
+    ends = np.append(starts[1:], len(point_codes))
+
+    features = bytearray()
+    values = bytearray()
+    for value_index, (code, start, end) in enumerate(zip(unique_codes.tolist(), starts.tolist(), ends.tolist())):
+        dx = np.diff(xs[start:end], prepend=0)
+        dy = np.diff(ys[start:end], prepend=0)
+        deltas = np.empty(2 * (end - start), dtype=np.uint64)
+        deltas[0::2] = _zigzag(dx)
+        deltas[1::2] = _zigzag(dy)
+        # MoveTo command (id 1) repeated once per point
+        geometry = _varint(((end - start) << 3) | 1) + _varints(deltas)
+
+        # tags: key 0 ("reflectivity") -> value_index; type 1 is POINT
+        feature = _message(2, b"\x00" + _varint(value_index))
+        feature += _tag(3, 0) + _varint(1)
+        feature += _message(4, geometry)
+        features += _message(2, feature)
+
+        reflectivity = config.QUANT_OFFSET + code * config.QUANT_SCALE
+        values += _message(4, _tag(2, 5) + struct.pack("<f", reflectivity))
+
+    layer = _tag(15, 0) + _varint(2)
+    layer += _message(1, LAYER_NAME.encode("utf-8"))
+    layer += bytes(features)
+    layer += _message(3, b"reflectivity")
+    layer += bytes(values)
+    layer += _tag(5, 0) + _varint(extent)
+    return _message(3, layer)
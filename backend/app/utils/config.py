@@ -1,10 +1,152 @@
 import os
+import tempfile
 
 class Config:
     MRMS_BASE_URL = "https://mrms.ncep.noaa.gov/data"
     MRMS_RALA_PATH = "/2D/ReflectivityAtLowestAltitude/"
+    # Polls follow the learned MRMS cadence (PUBLISH_PERIOD until learned),
+    # never further apart than UPDATE_INTERVAL nor closer than POLL_MIN_INTERVAL;
+    # POLL_LATE_INTERVAL spaces re-polls for a late scan and the failure backoff
     UPDATE_INTERVAL = 5 * 60
+    PUBLISH_PERIOD = 2 * 60
+    POLL_MIN_INTERVAL = 10
+    POLL_LATE_INTERVAL = 20
+    POLL_BACKOFF_MAX = 5 * 60
+    # Served data is fresh for CACHE_FRESH seconds after a refresh (about one
+    # scan), then served stale while caches revalidate, and expires (is no
+    # longer served) CACHE_TTL seconds after the last refresh
+    CACHE_FRESH = PUBLISH_PERIOD
     CACHE_TTL = 10 * 60
+    # Every Nth row/column of the native grid is emitted as a point
+    DECIMATION_FACTOR = int(os.getenv("DECIMATION_FACTOR", 20))
+    MIN_REFLECTIVITY = -10.0
+    MAX_REFLECTIVITY = 75.0
+    # Compact payloads store reflectivity as uint8: value = QUANT_OFFSET + code * QUANT_SCALE
+    QUANT_OFFSET = MIN_REFLECTIVITY
+    QUANT_SCALE = 0.5
+    # Radar products by name: MRMS directory, units, GeoJSON property, valid
+    # value range, uint8 quantization (value = offset + code * scale) and
+    # point decimation. The default product also drives frames, contours,
+    # the image overlay, tiles and the event stream.
+    DEFAULT_PRODUCT = "reflectivity"
+    PRODUCTS = {
+        "reflectivity": {
+            "path": MRMS_RALA_PATH,
+            "units": "dBZ",
+            "property": "reflectivity",
+            "min_value": MIN_REFLECTIVITY,
+            "max_value": MAX_REFLECTIVITY,
+            "offset": QUANT_OFFSET,
+            "scale": QUANT_SCALE,
+            "decimation": DECIMATION_FACTOR,
+        },
+        "composite": {
+            "path": "/2D/MergedReflectivityQCComposite/",
+            "units": "dBZ",
+            "property": "reflectivity",
+            "min_value": MIN_REFLECTIVITY,
+            "max_value": MAX_REFLECTIVITY,
+            "offset": QUANT_OFFSET,
+            "scale": QUANT_SCALE,
+            "decimation": DECIMATION_FACTOR,
+        },
+        "precip_rate": {
+            "path": "/2D/PrecipRate/",
+            "units": "mm/h",
+            "property": "precipRate",
+            "min_value": 0.1,
+            "max_value": 127.0,
+            "offset": 0.0,
+            "scale": 0.5,
+            "decimation": DECIMATION_FACTOR,
+        },
+        "echo_tops": {
+            "path": "/2D/EchoTop_18/",
+            "units": "km",
+            "property": "echoTop",
+            "min_value": 0.1,
+            "max_value": 25.0,
+            "offset": 0.0,
+            "scale": 0.1,
+            "decimation": DECIMATION_FACTOR,
+        },
+    }
+    # Only the default product unless RADAR_PRODUCTS opts into more: each one
+    # adds a download, a decode, scratch space and resident grids per refresh
+    ENABLED_PRODUCTS = [
+        name.strip() for name in os.getenv("RADAR_PRODUCTS", DEFAULT_PRODUCT).split(",") if name.strip()
+    ]
+    # Product downloads and decodes in flight at once during a refresh
+    PRODUCT_CONCURRENCY = 2
+    # Regions of interest as (min_lon, min_lat, max_lon, max_lat). When
+    # RADAR_REGIONS names any, every decoded grid is cropped to the one box
+    # around all of them (their union, however far apart) before it leaves the
+    # parse worker, and each region is cached and served separately
+    # (/api/radar/latest?region=<name>). The worker still unpacks the whole
+    # field first, so its peak memory does not shrink. Unset: whole grid.
+    REGIONS = {
+        "northeast": (-82.0, 37.0, -66.5, 47.5),
+        "southeast": (-92.0, 24.0, -75.0, 37.0),
+        "midwest": (-104.0, 36.0, -80.0, 49.5),
+        "south_central": (-107.0, 25.5, -88.0, 37.0),
+        "northwest": (-125.0, 41.0, -104.0, 49.5),
+        "southwest": (-125.0, 31.0, -102.0, 42.0),
+    }
+    ENABLED_REGIONS = [name.strip() for name in os.getenv("RADAR_REGIONS", "").split(",") if name.strip()]
+    # format=contours: isoband edges in dBZ, grid stride the bands are traced
+    # at, Douglas-Peucker tolerance and smallest kept ring (both in traced
+    # cells). Every 4th cell (about 4 km) keeps storm outlines far finer than
+    # the points while tracing ~16x fewer cells; on a CONUS grid that is about
+    # 0.5 s and a payload well under the points'
+    CONTOUR_LEVELS = [5, 10, 20, 30, 40, 50, 60]
+    CONTOUR_DECIMATION = 4
+    CONTOUR_TOLERANCE = 2
+    CONTOUR_MIN_AREA = 16
+    # /api/radar/image.png: longest side in pixels, within common WebGL texture limits
+    IMAGE_MAX_SIZE = int(os.getenv("IMAGE_MAX_SIZE", 4096))
+    # Vector tiles: points per tile axis before decimation, MVT extent, LRU budget
+    TILE_SAMPLES = 128
+    TILE_EXTENT = 4096
+    MAX_TILE_ZOOM = 14
+    TILE_CACHE_BYTES = int(os.getenv("TILE_CACHE_BYTES", 64 * 1024 * 1024))
+    # LRU budget for encoded bbox/min_dbz responses of /api/radar/latest
+    QUERY_CACHE_BYTES = int(os.getenv("QUERY_CACHE_BYTES", 64 * 1024 * 1024))
+    # Frame history for loop animation: ~1 hour of 2-minute scans at 4x decimation
+    FRAME_HISTORY_SIZE = int(os.getenv("FRAME_HISTORY_SIZE", 30))
+    FRAME_HISTORY_BYTES = int(os.getenv("FRAME_HISTORY_MB", 128)) * 1024 * 1024
+    FRAME_DECIMATION = 4
+    BACKFILL_CONCURRENCY = 4
+    # On-disk snapshots of the latest grid and frames, restored on startup
+    SNAPSHOT_DIR = os.getenv(
+        "SNAPSHOT_DIR",
+        os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "data", "snapshots"),
+    )
+    SNAPSHOT_MAX_AGE = int(os.getenv("SNAPSHOT_MAX_AGE", 60 * 60))
+    # With several server workers, one (elected by file lock) fetches and
+    # publishes to SNAPSHOT_DIR; the others memory-map what it publishes
+    WORKERS = int(os.getenv("WEB_CONCURRENCY", 1))
+    SHARED_CACHE = os.getenv("SHARED_CACHE", "1" if WORKERS > 1 else "0") == "1"
+    SHARED_POLL_INTERVAL = 1.0
+    # /api/radar/points: decimated cells extracted and serialized per row band
+    STREAM_BAND_CELLS = 64 * 1024
+    # Locations accepted by one POST /api/radar/point
+    POINT_BATCH_MAX = 100_000
+    # /api/radar/stream: events buffered per client before it is dropped, keep-alive period
+    STREAM_QUEUE_SIZE = 8
+    STREAM_HEARTBEAT = 15
+    # GRIB2 decoding runs in a separate worker process with these limits. A
+    # full CONUS decode peaks around 300 MB; the ceiling sits well below the
+    # 2 GB container limit (docker-compose.yml) so the worker is replaced
+    # before the OOM killer picks a process
+    PARSE_TIMEOUT = 300
+    PARSE_MAX_RSS = int(os.getenv("PARSE_MAX_RSS_MB", 1024)) * 1024 * 1024
+    # Decoded grids (float32, ~98 MB per CONUS grid) are written here and
+    # memory-mapped by the API process. A disk directory keeps those pages
+    # evictable page cache; tmpfs such as /dev/shm (64 MB in Docker by
+    # default) would pin them in memory, two grids per product
+    PARSE_SCRATCH_DIR = os.getenv("PARSE_SCRATCH_DIR", tempfile.gettempdir())
+    # Seconds from process start to serving radar data before startup logs a warning
+    STARTUP_TARGET = float(os.getenv("STARTUP_TARGET", 30))
     SERVER_PORT = int(os.getenv("PORT", 8000))
     CORS_ORIGINS = [
         "http://localhost:3000",
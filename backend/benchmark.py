@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark of the radar processing pipeline.
+
+Generates synthetic MRMS-like GRIB2 fixtures, serves them from a local
+stand-in for the MRMS directory listing and times every stage (gunzip,
+GRIB2 decode, point extraction, serialization, cache set/get, contours,
+image, end-to-end update and ``/api/radar/latest`` latency) at several
+grid sizes and decimation factors, plus the cold import time of the API
+process. No network access is needed.
+
+Progress goes to stderr; the results are printed (or written with
+``--output``) as JSON so runs can be compared across releases.
+
+    python benchmark.py --sizes 875x1750,3500x7000 --decimations 5,20 --output bench.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gzip
+import json
+import os
+import platform
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+from app.utils.config import config
+
+FIXTURE_TIME = datetime(2024, 5, 20, 21, 0, tzinfo=timezone.utc)
+NATIVE_STEP = 0.01
+NATIVE_SHAPE = (3500, 7000)
+
+def make_field(rows: int, cols: int, seed: int = 0) -> np.ndarray:
+    """
+    Reflectivity with MRMS-like structure: storm cells of various sizes and
+    intensities over light noise, -999 outside a radar coverage footprint.
+    """
+    rng = np.random.default_rng(seed)
+    y = np.arange(rows, dtype=np.float32) / rows
+    x = np.arange(cols, dtype=np.float32) / cols
+    field = np.full((rows, cols), -20, dtype=np.float32)
+    for _ in range(40):
+        cy, cx = rng.uniform(0, 1, 2)
+        sy, sx = rng.uniform(0.01, 0.08, 2)
+        amplitude = rng.uniform(20, 80)
+        cell = np.outer(np.exp(-((y - cy) / sy) ** 2), amplitude * np.exp(-((x - cx) / sx) ** 2))
+        np.maximum(field, cell - 15, out=field)
+    field += rng.normal(0, 2, (rows, cols)).astype(np.float32)
+    field = np.round(field * 2) / 2
+    coverage = ((y[:, None] - 0.5) / 0.6) ** 2 + ((x[None, :] - 0.5) / 0.55) ** 2 <= 1
+    field[~coverage] = -999
+    return field
+
+def make_grib2(rows: int, cols: int, seed: int = 0) -> bytes:
+    """A single-message GRIB2 file on a CONUS-like regular lat/lon grid."""
+    import eccodes
+
+    step = NATIVE_STEP * NATIVE_SHAPE[0] / rows
+    gid = eccodes.codes_grib_new_from_samples("regular_ll_sfc_grib2")
+    try:
+        for key, value in (
+            ("Ni", cols),
+            ("Nj", rows),
+            ("latitudeOfFirstGridPointInDegrees", 54.995),
+            ("longitudeOfFirstGridPointInDegrees", 230.005),
+            ("latitudeOfLastGridPointInDegrees", 54.995 - (rows - 1) * step),
+            ("longitudeOfLastGridPointInDegrees", 230.005 + (cols - 1) * step),
+            ("iDirectionIncrementInDegrees", step),
+            ("jDirectionIncrementInDegrees", step),
+            ("jScansPositively", 0),
+            ("bitsPerValue", 16),
+        ):
+            eccodes.codes_set(gid, key, value)
+        eccodes.codes_set_values(gid, make_field(rows, cols, seed).ravel().astype(np.float64))
+        return eccodes.codes_get_message(gid)
+    finally:
+        eccodes.codes_release(gid)
+
+class FixtureServer:
+    """
+    Minimal stand-in for the MRMS HTTP server: a directory listing at
+    ``MRMS_RALA_PATH`` linking timestamped ``.grib2.gz`` files held in memory.
+    """
+
+    def __init__(self):
+        self.files = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == config.MRMS_RALA_PATH:
+                    links = "".join(f'<a href="{name}">{name}</a>\n' for name in sorted(server.files))
+                    self._send(f"<html><body>{links}</body></html>".encode("utf-8"), "text/html")
+                elif path.startswith(config.MRMS_RALA_PATH) and path[len(config.MRMS_RALA_PATH):] in server.files:
+                    self._send(server.files[path[len(config.MRMS_RALA_PATH):]], "application/octet-stream")
+                else:
+                    self.send_error(404)
+
+            def _send(self, body: bytes, content_type: str):
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._httpd.server_address[1]}"
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+
+    def publish(self, compressed: bytes, timestamp: datetime) -> str:
+        name = f"MRMS_ReflectivityAtLowestAltitude_00.50_{timestamp:%Y%m%d-%H%M%S}.grib2.gz"
+        self.files[name] = compressed
+        return name
+
+    def __enter__(self) -> "FixtureServer":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+def _reset_peak_rss() -> bool:
+    """Reset this process's ``VmHWM`` (Linux); False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as clear_refs:
+            clear_refs.write("5")
+        return True
+    except OSError:
+        return False
+
+def _peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    # ru_maxrss is in KiB on Linux, bytes on macOS; it never resets
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale
+
+def measure(function, repeat: int):
+    """Time ``function`` ``repeat`` times; returns ``(stage stats, last result)``."""
+    durations = []
+    _reset_peak_rss()
+    result = None
+    for _ in range(repeat):
+        result = None
+        start = time.perf_counter()
+        result = function()
+        durations.append(time.perf_counter() - start)
+    stats = {
+        "min": round(min(durations), 6),
+        "median": round(statistics.median(durations), 6),
+        "peakRssMb": round(_peak_rss_mb(), 1),
+    }
+    return stats, result
+
+def percentile(samples, fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+def bench_size(rows: int, cols: int, decimations, repeat: int, server: FixtureServer, timestamp: datetime, requests: int):
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.services import mrms_fetcher, scheduler
+    from app.services.contours import grid_to_contours
+    from app.services.data_cache import DataCache, cache
+    from app.services.frame_history import RadarFrame
+    from app.services.grib2_parser import decode_grib2, extract_points, points_to_geojson
+    from app.services.radar_encoding import encode_columnar
+    from app.services.radar_image import render_png
+
+    print(f"Generating {rows}x{cols} fixture...", file=sys.stderr)
+    raw = make_grib2(rows, cols)
+    compressed = gzip.compress(raw, compresslevel=6)
+    server.publish(compressed, timestamp)
+    result = {"rows": rows, "cols": cols, "gribBytes": len(raw), "gzipBytes": len(compressed), "stages": {}}
+    stages = result["stages"]
+
+    def gunzip():
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        return decompressor.decompress(compressed) + decompressor.flush()
+
+    stages["gunzip"], _ = measure(gunzip, repeat)
+    stages["decode"], grid = measure(lambda: decode_grib2(raw), repeat)
+    stages["frame"], _ = measure(lambda: RadarFrame.from_grid(grid, timestamp), repeat)
+    stages["contours"], contours = measure(lambda: grid_to_contours(grid), 1)
+    stages["contours"]["bytes"] = len(json.dumps(contours, separators=(",", ":")))
+    stages["image"], image = measure(lambda: render_png(grid), repeat)
+    stages["image"]["bytes"] = len(image)
+
+    result["decimations"] = []
+    for decimation in decimations:
+        print(f"  decimation {decimation}", file=sys.stderr)
+        entry = {"decimation": decimation, "stages": {}}
+        timings = entry["stages"]
+        timings["extract"], points = measure(lambda: extract_points(grid, decimation), repeat)
+        entry["points"] = int(len(points[0]))
+        timings["geojson"], geojson = measure(lambda: points_to_geojson(*points), repeat)
+        timings["serialize"], body = measure(lambda: json.dumps(geojson, separators=(",", ":")).encode("utf-8"), repeat)
+        timings["serialize"]["bytes"] = len(body)
+        timings["columnar"], columnar = measure(lambda: encode_columnar(grid, decimation), repeat)
+
+        local = DataCache()
+        timings["cacheSet"], _ = measure(lambda: local.set(geojson, timestamp, columnar=columnar, grid=grid), repeat)
+        for format, payload in local.payloads.items():
+            entry[f"{format}Bytes"] = {"body": len(payload.body), "gzip": len(payload.gzip), "brotli": len(payload.brotli) if payload.brotli else None}
+        gets = 10000
+        stats, _ = measure(lambda: [local.get_payload("geojson") for _ in range(gets)], 1)
+        timings["cacheGet"] = {"perCallUs": round(stats["min"] / gets * 1e6, 3)}
+        result["decimations"].append(entry)
+        del points, geojson, body, columnar, local
+
+    async def update():
+        try:
+            await scheduler.update_radar_data()
+        finally:
+            # The shared HTTP client is bound to this event loop
+            await mrms_fetcher.close_client()
+
+    print("  end-to-end update", file=sys.stderr)
+    mrms_fetcher.remember_source(None)
+    stats, _ = measure(lambda: asyncio.run(update()), 1)
+    # Reaping the worker folds its peak into RUSAGE_CHILDREN (a maximum over
+    # every worker so far, so list sizes in increasing order)
+    scheduler.parse_worker.stop()
+    stats["parseWorkerPeakRssMb"] = round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+    stats["ok"] = cache.data_timestamp == timestamp
+    stages["update"] = stats
+
+    client = TestClient(app)
+    latency = {}
+    for format in ("geojson", "columnar", "contours"):
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get(f"/api/radar/latest?format={format}", headers={"Accept-Encoding": "br, gzip"})
+            samples.append(time.perf_counter() - start)
+        latency[format] = {
+            "status": response.status_code,
+            "wireBytes": response.num_bytes_downloaded,
+            "p50Ms": round(percentile(samples, 0.5) * 1000, 3),
+            "p95Ms": round(percentile(samples, 0.95) * 1000, 3),
+        }
+    stages["latest"] = latency
+    return result
+
+# Only the parse worker and the elected fetcher should load these
+HEAVY_MODULES = ("eccodes", "gribapi", "httpx", "xarray", "cfgrib")
+
+COLD_IMPORT = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "modules": len(sys.modules),
+    "heavy": sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules),
+}}))
+"""
+
+def measure_cold_start(repeat: int):
+    """Import ``app.main`` in fresh interpreters, as a server worker does on a cold start."""
+    runs = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-c", COLD_IMPORT],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    durations = [run["seconds"] for run in runs]
+    return {
+        "importMin": round(min(durations), 6),
+        "importMedian": round(statistics.median(durations), 6),
+        "modules": runs[-1]["modules"],
+        "heavyModules": runs[-1]["heavy"],
+    }
+
+def parse_sizes(value: str):
+    return [tuple(int(part) for part in size.lower().split("x")) for size in value.split(",")]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--sizes", default="875x1750,1750x3500,3500x7000", help="Comma-separated ROWSxCOLS grid sizes")
+    parser.add_argument("--decimations", default="5,20", help="Comma-separated decimation factors")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage; min and median are reported")
+    parser.add_argument("--requests", type=int, default=50, help="Requests per format for /api/radar/latest latency")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    sizes = parse_sizes(args.sizes)
+    decimations = [int(value) for value in args.decimations.split(",")]
+    report = {
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "environment": {
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+        },
+        "repeat": args.repeat,
+        "coldStart": measure_cold_start(args.repeat),
+        "results": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="radar-bench-") as snapshot_dir, FixtureServer() as server:
+        config.MRMS_BASE_URL = server.url
+        config.SNAPSHOT_DIR = snapshot_dir
+        config.SHARED_CACHE = False
+        from app.services.scheduler import parse_worker
+
+        try:
+            # Application modules log with print(); keep stdout for the report
+            with contextlib.redirect_stdout(sys.stderr):
+                for index, (rows, cols) in enumerate(sizes):
+                    timestamp = FIXTURE_TIME + timedelta(minutes=2 * index)
+                    report["results"].append(
+                        bench_size(rows, cols, decimations, args.repeat, server, timestamp, args.requests)
+                    )
+        finally:
+            parse_worker.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
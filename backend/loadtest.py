@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+"""
+Load test of the radar API while refreshes run.
+
+Starts the app in this process against a local stand-in for the MRMS
+server (the benchmark's fixture server) and publishes a new synthetic scan
+every ``--refresh-interval`` seconds, each fetched and parsed by the real
+refresh on the server's event loop. Meanwhile, client processes simulate
+``--clients`` concurrent pollers of ``/api/radar/latest``. Reports request
+latency (p50/p99), throughput and event-loop stalls, split by whether a
+refresh was in flight: a refresh that blocks the loop shows up as stalls
+and as slow requests during refreshes.
+
+Progress goes to stderr; the results are printed (or written with
+``--output``) as JSON.
+
+    python loadtest.py --clients 2000 --duration 60 --size 875x1750 --output load.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import gzip
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import socket
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from app.utils.config import config
+from benchmark import FIXTURE_TIME, FixtureServer, make_grib2, parse_sizes, percentile
+
+# Event-loop lag above this counts as a stall
+STALL_THRESHOLD = 0.01
+
+def _raise_file_limit():
+    """Thousands of pollers need as many sockets; lift the soft limit to the hard one."""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if hard == resource.RLIM_INFINITY or soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard if hard != resource.RLIM_INFINITY else 65536, hard))
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+# Clients
+
+def _client_main(url: str, pollers: int, start_at: float, stop_at: float, interval: float, conditional: bool, results):
+    """One client process: ``pollers`` concurrent pollers, each on its own connection."""
+    _raise_file_limit()
+    results.put(asyncio.run(_run_pollers(url, pollers, start_at, stop_at, interval, conditional)))
+
+async def _run_pollers(url: str, pollers: int, start_at: float, stop_at: float, interval: float, conditional: bool):
+    import httpx
+
+    records = []
+    errors = 0
+    limits = httpx.Limits(max_connections=pollers, max_keepalive_connections=pollers)
+    headers = {"Accept-Encoding": "br, gzip"}
+
+    async def poll(client):
+        nonlocal errors
+        etag = None
+        # Spread the first requests over one interval, as real clients would be
+        await asyncio.sleep(max(0.0, start_at - time.time()) + random.uniform(0, interval))
+        while time.time() < stop_at:
+            sent = time.time()
+            start = time.perf_counter()
+            try:
+                response = await client.get(url, headers={**headers, "If-None-Match": etag} if etag else headers)
+                await response.aread()
+            except httpx.HTTPError:
+                errors += 1
+                await asyncio.sleep(interval)
+                continue
+            elapsed = time.perf_counter() - start
+            records.append((sent, elapsed, response.status_code, response.num_bytes_downloaded))
+            if conditional:
+                etag = response.headers.get("etag", etag)
+            await asyncio.sleep(max(0.0, interval - elapsed) * random.uniform(0.8, 1.2))
+
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        await asyncio.gather(*(poll(client) for _ in range(pollers)))
+    return np.array(records, dtype=np.float64).reshape(-1, 4), errors
+
+# Server side
+
+class LoopMonitor:
+    """Samples how late the event loop wakes from short sleeps; the lateness is time it was blocked."""
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = []
+
+    async def run(self):
+        while True:
+            start = time.perf_counter()
+            await asyncio.sleep(self.interval)
+            self.samples.append((time.time(), max(0.0, time.perf_counter() - start - self.interval)))
+
+def _stage_seconds():
+    from app.services import metrics
+
+    samples = metrics.STAGE_LAST_SECONDS.samples()
+    return {stage: round(value, 4) for _, (product, stage), _, value in samples if product == config.DEFAULT_PRODUCT}
+
+async def _drive_refreshes(server: FixtureServer, scans, interval: float, stop_at: float, refreshes):
+    """Publish a new scan every ``interval`` seconds and run the app's refresh for it."""
+    from app.services import scheduler
+
+    index = 1
+    while time.time() + interval < stop_at:
+        await asyncio.sleep(interval)
+        server.publish(scans[index % len(scans)], FIXTURE_TIME + timedelta(minutes=2 * index))
+        start = time.time()
+        outcome = await scheduler.update_radar_data()
+        refreshes.append({"start": start, "end": time.time(), "outcome": outcome, "stages": _stage_seconds()})
+        print(f"  refresh {index}: {outcome} in {time.time() - start:.2f}s", file=sys.stderr)
+        index += 1
+
+def _latency_stats(records: np.ndarray, duration: float):
+    if not len(records):
+        return {"requests": 0}
+    latencies = records[:, 1].tolist()
+    statuses = {}
+    for status in records[:, 2].astype(int).tolist():
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    return {
+        "requests": len(latencies),
+        "throughputPerSecond": round(len(latencies) / duration, 1),
+        "status": statuses,
+        "wireBytes": int(records[:, 3].sum()),
+        "p50Ms": round(percentile(latencies, 0.5) * 1000, 3),
+        "p90Ms": round(percentile(latencies, 0.9) * 1000, 3),
+        "p99Ms": round(percentile(latencies, 0.99) * 1000, 3),
+        "maxMs": round(max(latencies) * 1000, 3),
+    }
+
+def _stall_stats(lags):
+    if not lags:
+        return {"samples": 0}
+    stalls = [lag for lag in lags if lag > STALL_THRESHOLD]
+    return {
+        "samples": len(lags),
+        "p99Ms": round(percentile(lags, 0.99) * 1000, 3),
+        "maxMs": round(max(lags) * 1000, 3),
+        "stalls": len(stalls),
+        "stalledMs": round(sum(stalls) * 1000, 1),
+    }
+
+def _in_windows(times: np.ndarray, windows) -> np.ndarray:
+    inside = np.zeros(len(times), dtype=bool)
+    for start, end in windows:
+        inside |= (times >= start) & (times <= end)
+    return inside
+
+async def run(args, server: FixtureServer, scans):
+    import uvicorn
+    from app.main import app
+    from app.services import mrms_fetcher, scheduler
+
+    port = _free_port()
+    uvicorn_server = uvicorn.Server(
+        uvicorn.Config(app, host="127.0.0.1", port=port, lifespan="off", log_level="warning", backlog=4096)
+    )
+    serving = asyncio.create_task(uvicorn_server.serve())
+    while not uvicorn_server.started:
+        await asyncio.sleep(0.05)
+
+    # Serve the first scan before any client connects
+    server.publish(scans[0], FIXTURE_TIME)
+    print(f"  initial refresh: {await scheduler.update_radar_data()}", file=sys.stderr)
+
+    monitor = LoopMonitor()
+    monitoring = asyncio.create_task(monitor.run())
+    start_at = time.time() + 2
+    stop_at = start_at + args.duration
+    url = f"http://127.0.0.1:{port}/api/radar/latest?format={args.format}"
+
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    shares = [args.clients // args.processes + (1 if i < args.clients % args.processes else 0) for i in range(args.processes)]
+    clients = [
+        context.Process(target=_client_main, args=(url, share, start_at, stop_at, args.poll_interval, not args.unconditional, results))
+        for share in shares
+        if share
+    ]
+    for process in clients:
+        process.start()
+    print(f"  {args.clients} pollers in {len(clients)} processes for {args.duration}s", file=sys.stderr)
+
+    refreshes = []
+    await asyncio.sleep(max(0.0, start_at - time.time()))
+    await _drive_refreshes(server, scans, args.refresh_interval, stop_at, refreshes)
+
+    # Client results arrive once every poller has stopped
+    outputs = [await asyncio.to_thread(results.get) for _ in clients]
+    for process in clients:
+        process.join()
+    monitoring.cancel()
+    uvicorn_server.should_exit = True
+    await serving
+    await mrms_fetcher.close_client()
+
+    records = np.concatenate([records for records, _ in outputs])
+    records = records[(records[:, 0] >= start_at) & (records[:, 0] <= stop_at)]
+    windows = [(refresh["start"], refresh["end"]) for refresh in refreshes]
+    during = _in_windows(records[:, 0], windows)
+    refresh_time = sum(end - start for start, end in windows)
+
+    lag_times = np.array([t for t, _ in monitor.samples])
+    lags = np.array([lag for _, lag in monitor.samples])
+    measured = (lag_times >= start_at) & (lag_times <= stop_at)
+    lag_during = _in_windows(lag_times, windows) & measured
+
+    return {
+        "requests": {
+            "all": _latency_stats(records, args.duration),
+            "duringRefresh": _latency_stats(records[during], refresh_time or args.duration),
+            "betweenRefreshes": _latency_stats(records[~during], (args.duration - refresh_time) or args.duration),
+            "errors": sum(errors for _, errors in outputs),
+        },
+        "eventLoop": {
+            "stallThresholdMs": STALL_THRESHOLD * 1000,
+            "all": _stall_stats(lags[measured].tolist()),
+            "duringRefresh": _stall_stats(lags[lag_during].tolist()),
+            "betweenRefreshes": _stall_stats(lags[measured & ~lag_during].tolist()),
+        },
+        "refreshes": [
+            {
+                "seconds": round(refresh["end"] - refresh["start"], 3),
+                "outcome": refresh["outcome"],
+                "maxStallMs": round(float(lags[_in_windows(lag_times, [(refresh["start"], refresh["end"])])].max(initial=0)) * 1000, 3),
+                "stages": refresh["stages"],
+            }
+            for refresh in refreshes
+        ],
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--clients", type=int, default=1000, help="Concurrent pollers")
+    parser.add_argument("--processes", type=int, default=max(1, min(4, (os.cpu_count() or 2) - 1)), help="Client processes")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of load")
+    parser.add_argument("--poll-interval", type=float, default=1.0, help="Seconds between one poller's requests")
+    parser.add_argument("--refresh-interval", type=float, default=10, help="Seconds between new scans")
+    parser.add_argument("--size", default="875x1750", help="ROWSxCOLS of the synthetic grid")
+    parser.add_argument("--scans", type=int, default=3, help="Distinct synthetic scans to cycle through")
+    parser.add_argument("--format", default="columnar", choices=("geojson", "columnar", "contours"))
+    parser.add_argument("--unconditional", action="store_true", help="Never send If-None-Match")
+    parser.add_argument("--output", help="Write JSON here instead of stdout")
+    args = parser.parse_args()
+    _raise_file_limit()
+
+    (rows, cols), = parse_sizes(args.size)
+    print(f"Generating {args.scans} scans of {rows}x{cols}", file=sys.stderr)
+    scans = [gzip.compress(make_grib2(rows, cols, seed), compresslevel=6) for seed in range(args.scans)]
+
+    report = {
+        "createdAt": datetime.now(timezone.utc).isoformat(),
+        "environment": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "settings": {
+            "clients": args.clients,
+            "processes": args.processes,
+            "durationSeconds": args.duration,
+            "pollIntervalSeconds": args.poll_interval,
+            "refreshIntervalSeconds": args.refresh_interval,
+            "rows": rows,
+            "cols": cols,
+            "format": args.format,
+            "conditional": not args.unconditional,
+        },
+    }
+
+    with tempfile.TemporaryDirectory(prefix="radar-load-") as snapshot_dir, FixtureServer() as server:
+        config.MRMS_BASE_URL = server.url
+        config.SNAPSHOT_DIR = snapshot_dir
+        config.SHARED_CACHE = False
+        from app.services.scheduler import parse_worker
+
+        try:
+            # Application modules log with print(); keep stdout for the report
+            with contextlib.redirect_stdout(sys.stderr):
+                report.update(asyncio.run(run(args, server, scans)))
+        finally:
+            parse_worker.stop()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
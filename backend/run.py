@@ -14,10 +14,12 @@ if __name__ == "__main__":
     # Note: Token injection is no longer needed since frontend runs as separate service
     # Frontend gets VITE_MAPBOX_TOKEN from environment variables
     
+    # Several workers need an import string; they share one fetcher (SHARED_CACHE)
     uvicorn.run(
-        app,
+        "app.main:app" if config.WORKERS > 1 else app,
         host="0.0.0.0",
         port=config.SERVER_PORT,
+        workers=config.WORKERS,
         log_level="info"
     )
 
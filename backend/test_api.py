@@ -1,9 +1,10 @@
 #!/usr/bin/env python3
+import os
 import requests
 import json
 import time
 
-BASE_URL = "http://localhost:5000"
+BASE_URL = os.getenv("API_URL", "http://localhost:8000")
 
 def test_health():
     print("Testing health endpoint...")
@@ -53,7 +53,10 @@ function App() {
               </div>
             </div>
           ) : (
-            <RadarMap data={data?.data || null} mapboxToken={MAPBOX_TOKEN} />
+            <RadarMap
+              image={data}
+              mapboxToken={MAPBOX_TOKEN}
+            />
           )}
         </div>
         {!error && <Legend />}
@@ -2,15 +2,14 @@ import { useEffect, useRef, useState } from 'react';
 import 'mapbox-gl/dist/mapbox-gl.css';
 import type * as mapboxgl from 'mapbox-gl';
 import { initMapbox } from '../lib/mapbox';
-import { RADAR_COLORS } from '../utils/constants';
-import type { RadarData } from '../types/radar';
+import type { RadarImageMetadata } from '../types/api';
 
 interface RadarMapProps {
-  data: RadarData | null;
+  image: RadarImageMetadata | null;
   mapboxToken: string;
 }
 
-const RadarMap = ({ data, mapboxToken }: RadarMapProps) => {
+const RadarMap = ({ image, mapboxToken }: RadarMapProps) => {
   const mapContainer = useRef<HTMLDivElement>(null);
   const map = useRef<mapboxgl.Map | null>(null);
   const [mapLoaded, setMapLoaded] = useState(false);
@@ -40,101 +39,50 @@ const RadarMap = ({ data, mapboxToken }: RadarMapProps) => {
   }, [mapboxToken]);
 
   useEffect(() => {
-    if (!map.current || !mapLoaded || !data || !data.features || data.features.length === 0) {
+    if (!map.current || !mapLoaded || !image) {
       return;
     }
 
     const sourceId = 'radar-data';
-    const layerId = 'radar-heatmap';
+    const layerId = 'radar-image';
 
     const setupLayer = () => {
       if (!map.current) return;
 
       try {
-        // Calculate bounds from data
-        const coordinates = data.features.map(f => f.geometry.coordinates);
-        const lons = coordinates.map(c => c[0]);
-        const lats = coordinates.map(c => c[1]);
+        // Bounds of the grid, from the image's corner coordinates
+        const lons = image.coordinates.map(c => c[0]);
+        const lats = image.coordinates.map(c => c[1]);
         const bounds = [
           [Math.min(...lons), Math.min(...lats)],
           [Math.max(...lons), Math.max(...lats)]
         ] as [[number, number], [number, number]];
 
-        // Add or update source
-        if (map.current.getSource(sourceId)) {
-          const source = map.current.getSource(sourceId) as mapboxgl.GeoJSONSource;
-          source.setData(data);
+        // The backend renders each update once into a georeferenced PNG, so
+        // the map draws one textured quad instead of thousands of circles
+        const source = map.current.getSource(sourceId) as mapboxgl.ImageSource | undefined;
+        if (source) {
+          source.updateImage({ url: image.url, coordinates: image.coordinates });
         } else {
           map.current.addSource(sourceId, {
-            type: 'geojson',
-            data: data,
+            type: 'image',
+            url: image.url,
+            coordinates: image.coordinates,
           });
         }
 
-        // Remove existing layer if present
-        if (map.current.getLayer(layerId)) {
-          map.current.removeLayer(layerId);
+        if (!map.current.getLayer(layerId)) {
+          map.current.addLayer({
+            id: layerId,
+            type: 'raster',
+            source: sourceId,
+            paint: {
+              'raster-fade-duration': 0,
+              'raster-resampling': 'nearest',
+            },
+          });
         }
 
-        // Add circle layer
-        map.current.addLayer({
-          id: layerId,
-          type: 'circle',
-          source: sourceId,
-          paint: {
-            'circle-radius': [
-              'interpolate',
-              ['linear'],
-              ['zoom'],
-              0,
-              2,
-              5,
-              4,
-              10,
-              8,
-            ],
-            'circle-color': [
-              'interpolate',
-              ['linear'],
-              ['get', 'reflectivity'],
-              ...RADAR_COLORS.flat(),
-            ],
-            'circle-opacity': [
-              'interpolate',
-              ['linear'],
-              ['get', 'reflectivity'],
-              -10,
-              0.3,
-              0,
-              0.4,
-              10,
-              0.5,
-              20,
-              0.6,
-              30,
-              0.7,
-              40,
-              0.8,
-              50,
-              0.9,
-              60,
-              1,
-            ],
-            'circle-stroke-width': 0,
-            'circle-blur': [
-              'interpolate',
-              ['linear'],
-              ['zoom'],
-              0,
-              0.5,
-              5,
-              1,
-              10,
-              2,
-            ],
-          },
-        });
-
         // Fit map to data bounds with padding
         map.current.fitBounds(bounds, {
           padding: { top: 50, bottom: 50, left: 50, right: 50 },
@@ -152,7 +100,7 @@ const RadarMap = ({ data, mapboxToken }: RadarMapProps) => {
         setTimeout(setupLayer, 200);
       });
     }
-  }, [map, mapLoaded, data]);
+  }, [map, mapLoaded, image]);
 
   return (
     <div className="relative w-full h-full">
@@ -1,24 +1,29 @@
-import { useState, useEffect } from 'react';
-import { fetchRadarData } from '../lib/api';
-import type { RadarResponse, ApiError } from '../types/api';
+import { useState, useEffect, useRef } from 'react';
+import { fetchRadarImage, radarStreamUrl } from '../lib/api';
+import type { RadarImageMetadata, ApiError, RadarUpdateEvent } from '../types/api';
+
+// Fallback for browsers without EventSource
+const POLL_INTERVAL = 60000;
 
 interface UseRadarDataReturn {
-  data: RadarResponse | null;
+  data: RadarImageMetadata | null;
   loading: boolean;
   error: ApiError | null;
   refetch: () => Promise<void>;
 }
 
 export const useRadarData = (autoRefresh = false): UseRadarDataReturn => {
-  const [data, setData] = useState<RadarResponse | null>(null);
+  const [data, setData] = useState<RadarImageMetadata | null>(null);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<ApiError | null>(null);
+  const loadedTimestamp = useRef<string | null>(null);
 
   const loadData = async () => {
     try {
       setLoading(true);
       setError(null);
-      const response = await fetchRadarData();
+      const response = await fetchRadarImage();
+      loadedTimestamp.current = response.dataTimestamp;
       setData(response);
     } catch (err) {
       setError(err as ApiError);
@@ -31,10 +36,26 @@ export const useRadarData = (autoRefresh = false): UseRadarDataReturn => {
   useEffect(() => {
     loadData();
 
-    if (autoRefresh) {
-      const interval = setInterval(loadData, 60000);
+    if (!autoRefresh) {
+      return;
+    }
+
+    if (typeof EventSource === 'undefined') {
+      const interval = setInterval(loadData, POLL_INTERVAL);
       return () => clearInterval(interval);
     }
+
+    // The server pushes an event on connect and after every update; only
+    // refetch when it names data we have not loaded yet. EventSource
+    // reconnects on its own if the stream drops.
+    const source = new EventSource(radarStreamUrl());
+    source.addEventListener('radar', (event) => {
+      const update: RadarUpdateEvent = JSON.parse((event as MessageEvent).data);
+      if (update.dataTimestamp !== loadedTimestamp.current) {
+        loadData();
+      }
+    });
+    return () => source.close();
   }, [autoRefresh]);
 
   return {
@@ -1,5 +1,5 @@
 import axios from 'axios';
-import type { RadarResponse, ApiError } from '../types/api';
+import type { RadarImageMetadata, ApiError } from '../types/api';
 
 const API_BASE_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
 
@@ -8,15 +8,17 @@ const apiClient = axios.create({
   timeout: 30000,
 });
 
-export const fetchRadarData = async (): Promise<RadarResponse> => {
+// Pre-rendered overlay (see /api/radar/image); the metadata carries the
+// versioned PNG URL and its corner coordinates for a Mapbox image source.
+export const fetchRadarImage = async (): Promise<RadarImageMetadata> => {
   try {
-    const response = await apiClient.get<RadarResponse>('/api/radar/latest');
-    return response.data;
+    const response = await apiClient.get<RadarImageMetadata>('/api/radar/image');
+    return { ...response.data, url: `${API_BASE_URL}${response.data.url}` };
   } catch (error) {
     if (axios.isAxiosError(error)) {
       throw {
         error: error.response?.data?.error || 'Network Error',
-        message: error.response?.data?.message || error.message,
+        message: error.response?.data?.message || error.response?.data?.detail || error.message,
       } as ApiError;
     }
     throw {
@@ -26,3 +28,5 @@ export const fetchRadarData = async (): Promise<RadarResponse> => {
   }
 };
 
+// Server-Sent Events announcing each new radar update (see /api/radar/stream).
+export const radarStreamUrl = (): string => `${API_BASE_URL}/api/radar/stream`;
@@ -16,3 +16,17 @@ export interface RadarResponse {
   dataTimestamp: string;
 }
 
+export interface RadarUpdateEvent {
+  dataTimestamp: string;
+  lastUpdated: string;
+  etags: Record<string, string>;
+}
+
+export interface RadarImageMetadata {
+  url: string;
+  width: number;
+  height: number;
+  coordinates: [[number, number], [number, number], [number, number], [number, number]];
+  lastUpdated: string;
+  dataTimestamp: string;
+}
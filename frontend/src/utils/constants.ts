@@ -1,3 +1,5 @@
+// Mirrored by RADAR_COLORS in backend/app/services/radar_image.py, which
+// renders /api/radar/image.png; keep the two in sync.
 export const RADAR_COLORS = [
   [-10, 'rgba(0, 50, 200, 0.2)'],
   [0, 'rgba(0, 0, 255, 0.3)'],